@@ -2,8 +2,17 @@
 import tkinter as tk
 from tkinter import ttk
 import json
+import queue
 from datetime import datetime
 
+# số block hiển thị mỗi trang trong bảng Blocks
+BLOCKS_PAGE_SIZE = 200
+# UI chỉ được cập nhật bởi 1 vòng after() trên main thread, mỗi frame 1 lần
+UI_FRAME_MS = 50
+MAX_EVENTS_PER_FRAME = 500
+# số dòng log tối đa giữ trong widget (ring buffer)
+MAX_LOG_LINES = 1000
+
 
 class BlockDetailWindow(tk.Toplevel):
     def __init__(self, master, block):
@@ -33,10 +42,12 @@ class BlockDetailWindow(tk.Toplevel):
             "index": block.index,
             "timestamp": block.timestamp,
             "timestamp_readable": self._fmt_time(block.timestamp),
+            "version": getattr(block, "version", 1),
             "previous_hash": block.previous_hash,
+            "merkle_root": getattr(block, "merkle_root", None),
             "nonce": block.nonce,
             "hash": block.hash,
-            "transactions": block.transactions,
+            "transactions": block.transaction_dicts(),
         }
 
         txt.insert("1.0", json.dumps(detail, ensure_ascii=False, indent=2))
@@ -74,15 +85,25 @@ class NodeGUI(tk.Frame):
         self._last_peers_snapshot = None
         self._last_balance = None
 
+        # --- cửa sổ block đang hiển thị ---
+        self._follow_tip = True     # True: luôn hiển thị trang mới nhất
+        self._view_end = 0          # block cuối (không bao gồm) khi xem trang cũ
+        self._rows = []             # [(index, hash)] theo thứ tự trong tree
+
+        # --- event bus: thread nào cũng được put, chỉ main thread lấy ra ---
+        self._events = queue.Queue()
+        self._pump_job = None
+
         self._build_ui()
         self.pack(fill="both", expand=True)
         if hasattr(self.blockchain, "subscribe"):
-            self.blockchain.subscribe(self.refresh_all)
+            self.blockchain.subscribe(self.request_refresh)
         if hasattr(self.peers, "subscribe"):
-            self.peers.subscribe(self.refresh_all)
+            self.peers.subscribe(self.request_refresh)
         self.add_log("đã khởi động")
         # initial paint
         self.refresh_all(force=True)
+        self._pump_job = self.after(UI_FRAME_MS, self._pump_events)
 
 
     # ---------------- UI ----------------
@@ -187,7 +208,18 @@ class NodeGUI(tk.Frame):
         sb_blocks.grid(row=0, column=1, sticky="ns")
 
         self.blocks_tree.bind("<<TreeviewSelect>>", self._on_block_selected)
-        self._block_by_iid = {}
+
+        pager = tk.Frame(blocks_card, bg="white")
+        pager.grid(row=1, column=0, columnspan=2, sticky="ew", pady=(4, 0))
+        tk.Button(pager, text="◀ Older", relief="flat", bg="#ecf0f1",
+                  command=self._page_older).pack(side="left")
+        tk.Button(pager, text="Newer ▶", relief="flat", bg="#ecf0f1",
+                  command=self._page_newer).pack(side="left", padx=(6, 0))
+        tk.Button(pager, text="Tip", relief="flat", bg="#ecf0f1",
+                  command=self._page_tip).pack(side="left", padx=(6, 0))
+        self.page_var = tk.StringVar(value="")
+        tk.Label(pager, textvariable=self.page_var, bg="white",
+                 font=("Consolas", 9)).pack(side="right")
 
         # ---- Peers panel ----
         peers_card = tk.LabelFrame(main, text="Peers", bg="white", font=("Arial", 10, "bold"))
@@ -217,9 +249,41 @@ class NodeGUI(tk.Frame):
         self.log_text.configure(state="disabled")
 
     def refresh_all(self, force=False):
+        """Chỉ gọi trên main thread; thread khác dùng request_refresh()."""
         self._refresh_blocks(force=force)
         self._refresh_peers(force=force)
 
+    def request_refresh(self, force=False):
+        """Thread-safe: báo dữ liệu đã đổi, refresh ở frame kế tiếp."""
+        self._events.put(("refresh", force))
+
+    def _pump_events(self):
+        """
+        Chạy mỗi UI_FRAME_MS trên main thread: gom log + refresh trong queue,
+        ghi log 1 lần, refresh tối đa 1 lần mỗi frame.
+        """
+        lines = []
+        refresh = False
+        force = False
+        try:
+            for _ in range(MAX_EVENTS_PER_FRAME):
+                kind, value = self._events.get_nowait()
+                if kind == "log":
+                    lines.append(value)
+                else:
+                    refresh = True
+                    force = force or value
+        except queue.Empty:
+            pass
+
+        try:
+            if lines:
+                self._append_log_lines(lines)
+            if refresh:
+                self.refresh_all(force=force)
+        finally:
+            self._pump_job = self.after(UI_FRAME_MS, self._pump_events)
+
     # def _refresh_balance(self, force=False):
     #     try:
     #         bal = self.blockchain.get_balance(self.wallet_address)
@@ -234,7 +298,7 @@ class NodeGUI(tk.Frame):
     #         self.lbl_balance.configure(fg="#2ecc71" if float(bal) >= 0 else "#e74c3c")
 
     def _refresh_blocks(self, force=False):
-        chain = getattr(self.blockchain, "chain", [])
+        chain = self.blockchain.snapshot()
         chain_len = len(chain)
 
         tip_hash = None
@@ -250,24 +314,75 @@ class NodeGUI(tk.Frame):
         self._last_chain_len = chain_len
         self._last_tip_hash = tip_hash
 
-        # rebuild list
-        self.blocks_tree.delete(*self.blocks_tree.get_children())
-        self._block_by_iid.clear()
-
-        for b in chain:
-            iid = f"b{b.index}"
-            tx_count = len(b.transactions) #if isinstance(b.transactions, list) else 0
-            time_str = self._fmt_time(getattr(b, "timestamp", ""))
-            h = getattr(b, "hash", "")
-            short_hash = (h[:22] + "…") if isinstance(h, str) and len(h) > 23 else h
+        end = chain_len if self._follow_tip else min(self._view_end, chain_len)
+        start = max(0, end - BLOCKS_PAGE_SIZE)
+        self._sync_rows(chain, start, end)
+        self.page_var.set(f"#{start}–#{end - 1} / {chain_len}" if end > start else "")
+
+    def _sync_rows(self, chain, start, end):
+        """
+        Đưa tree về đúng cửa sổ chain[start:end] mà chỉ đụng tới các dòng đổi:
+        - tip tăng: thêm dòng mới ở cuối, cắt dòng cũ ở đầu
+        - reorg: xoá các dòng phía trên điểm rẽ nhánh rồi thêm lại
+        """
+        rows = self._rows
+
+        # dòng ở cuối không còn khớp chain (reorg / chain ngắn lại / ngoài cửa sổ)
+        keep = len(rows)
+        while keep > 0:
+            index, h = rows[keep - 1]
+            if index < end and chain[index].hash == h:
+                break
+            keep -= 1
+        # dòng ở đầu nằm ngoài cửa sổ
+        drop = 0
+        while drop < keep and rows[drop][0] < start:
+            drop += 1
+
+        stale = [f"b{index}" for index, _ in rows[:drop] + rows[keep:]]
+        if stale:
+            self.blocks_tree.delete(*stale)
+        rows = rows[drop:keep]
+
+        if rows and start < rows[0][0]:
+            # cửa sổ lùi về block cũ hơn -> chèn lên đầu
+            head = [self._insert_block_row(chain[i], pos) for pos, i in enumerate(range(start, rows[0][0]))]
+            rows = head + rows
+        next_index = rows[-1][0] + 1 if rows else start
+        rows.extend(self._insert_block_row(chain[i], "end") for i in range(next_index, end))
+        self._rows = rows
+
+    def _insert_block_row(self, b, position):
+        tx_count = len(b.transactions) #if isinstance(b.transactions, list) else 0
+        time_str = self._fmt_time(getattr(b, "timestamp", ""))
+        h = getattr(b, "hash", "")
+        short_hash = (h[:22] + "…") if isinstance(h, str) and len(h) > 23 else h
+
+        self.blocks_tree.insert(
+            "", position,
+            iid=f"b{b.index}",
+            values=(b.index, tx_count, time_str, short_hash)
+        )
+        return b.index, h
+
+    # -------------- Paging --------------
+    def _page_older(self):
+        chain_len = len(self.blockchain.chain)
+        end = chain_len if self._follow_tip else self._view_end
+        self._view_end = max(min(BLOCKS_PAGE_SIZE, chain_len), end - BLOCKS_PAGE_SIZE)
+        self._follow_tip = self._view_end >= chain_len
+        self.refresh_all(force=True)
 
-            self.blocks_tree.insert(
-                "", "end",
-                iid=iid,
-                values=(b.index, tx_count, time_str, short_hash)
-            )
-            self._block_by_iid[iid] = b
+    def _page_newer(self):
+        if self._follow_tip:
+            return
+        self._view_end += BLOCKS_PAGE_SIZE
+        self._follow_tip = self._view_end >= len(self.blockchain.chain)
+        self.refresh_all(force=True)
 
+    def _page_tip(self):
+        self._follow_tip = True
+        self.refresh_all(force=True)
 
     def _refresh_peers(self, force=False):
         # snapshot peers as tuple of strings
@@ -292,18 +407,29 @@ class NodeGUI(tk.Frame):
         if not sel:
             return
         iid = sel[0]
-        block = self._block_by_iid.get(iid)
-        if not block:
+        index = int(iid[1:])
+        rendered = dict(self._rows)
+        chain = self.blockchain.snapshot()
+        if index >= len(chain) or chain[index].hash != rendered.get(index):
             return
-        BlockDetailWindow(self.master, block)
+        BlockDetailWindow(self.master, chain[index])
 
     # -------------- Log --------------
     def add_log(self, msg: str):
+        """Thread-safe: chỉ đưa dòng log vào queue, main thread sẽ ghi."""
         time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self._events.put(("log", f"[{time}] : {msg}\n"))
 
+    def _append_log_lines(self, lines):
         # bật lên để ghi
         self.log_text.configure(state="normal")
-        self.log_text.insert(tk.END, f"[{time}] : {msg}\n")
+        self.log_text.insert(tk.END, "".join(lines))
+
+        # ring buffer: bỏ các dòng cũ nhất khi vượt MAX_LOG_LINES
+        line_count = int(self.log_text.index("end-1c").split(".")[0]) - 1
+        if line_count > MAX_LOG_LINES:
+            self.log_text.delete("1.0", f"{line_count - MAX_LOG_LINES + 1}.0")
+
         self.log_text.see(tk.END)
         # khoá lại để user không sửa
         self.log_text.configure(state="disabled")
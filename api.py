@@ -1,21 +1,117 @@
 # api.py
 from flask import Response, request, jsonify
 from block import Block
-import requests
+from gossip import get_dispatcher
+from seen_cache import SeenCache
+from chain_watch import ChainWatch
+from chain_cache import ChainJsonCache
+from block_tree import ADDED, REORG, SIDE, ORPHAN, INVALID
+from sync_scheduler import SyncScheduler
+import wire
 import threading
 import queue
 import json
 
-seen_tx = set()
+# chống relay trùng: tx_id và hash block đã thấy gần đây (có giới hạn)
+seen_tx = SeenCache(capacity=100_000, ttl=3600)
+seen_blocks = SeenCache(capacity=10_000, ttl=3600)
 
-def register_routes(app, blockchain, peers, memPool, add_log, stop_mining_event):
+# số block/header tối đa mỗi lần gọi /headers, /blocks/range
+MAX_RANGE = 500
+# số giao dịch tối đa trong 1 lần POST /transactions/batch
+MAX_TX_BATCH = 1000
+# thời gian giữ tối đa 1 request long-poll /watch (giây)
+MAX_WATCH_TIMEOUT = 30
+# số request /watch được giữ cùng lúc (mặc định); vượt quá -> 503 để long-poll
+# không chiếm hết thread của server, /blocks/receive, /tip... vẫn được phục vụ
+MAX_WATCHERS = 4
+# số block từ peer chờ xử lý tối đa trong hàng đợi
+BLOCK_INBOX_SIZE = 1000
+
+
+def _wants_wire():
+    """Client xin định dạng wire nhị phân qua Accept (JSON vẫn là mặc định)."""
+    best = request.accept_mimetypes.best_match(["application/json", wire.CONTENT_TYPE])
+    return best == wire.CONTENT_TYPE
+
+
+def _is_wire_body():
+    return request.mimetype == wire.CONTENT_TYPE
+
+
+def _tx_location(block, position):
+    return {
+        "block_hash": block.hash,
+        "height": block.index,
+        "position": position,
+        "timestamp": block.timestamp,
+        "transaction": block.transactions[position].to_dict(),
+    }
+
+
+def _limit_arg():
+    return min(max(1, request.args.get("limit", default=MAX_RANGE, type=int)), MAX_RANGE)
+
+
+def _range_args(chain_length):
+    """Đọc ?from=&to=&limit= (to không bao gồm), giới hạn tối đa MAX_RANGE."""
+    start = max(0, request.args.get("from", default=0, type=int))
+    end = request.args.get("to", default=chain_length, type=int)
+    end = min(end, chain_length, start + _limit_arg())
+    return start, max(start, end)
+
+def register_routes(app, blockchain, peers, memPool, add_log, stop_mining_event, gossip=None,
+                    wallet_address=None, log_sink=None, sync_scheduler=None,
+                    max_watchers=MAX_WATCHERS):
     """
     Hàm này nhận vào:
       - app: Flask app
       - blockchain: đối tượng Blockchain
       - peers: tập (set) các peer URL
+      - memPool: Mempool chứa giao dịch chờ đào
+      - gossip: GossipDispatcher dùng để relay (mặc định: dispatcher dùng chung)
+      - wallet_address: ví nhận thưởng của node (để dashboard hiển thị)
+      - log_sink: LogSink, nếu có thì mở /logs cho dashboard đọc
+      - sync_scheduler: SyncScheduler dùng chung với node (mặc định: tạo mới)
+      - max_watchers: số long-poll /watch giữ cùng lúc, phải nhỏ hơn số thread của server
     Và đăng ký toàn bộ route cho app.
     """
+    gossip = gossip or get_dispatcher()
+    sync_scheduler = sync_scheduler or SyncScheduler(blockchain, peers, add_log)
+    chain_watch = ChainWatch(blockchain)
+    watch_slots = threading.BoundedSemaphore(max(1, max_watchers))
+    chain_cache = ChainJsonCache(blockchain)
+    wire_cache = ChainJsonCache(blockchain, encode=wire.encode_block)
+
+    # block từ peer được xử lý tuần tự trên 1 thread nền,
+    # /blocks/receive chỉ xếp hàng rồi trả lời ngay
+    block_inbox = queue.Queue(maxsize=BLOCK_INBOX_SIZE)
+
+    def process_block(block):
+        status = blockchain.add_block_from_peer(block)
+        if status == INVALID:
+            add_log("block không hợp lệ")
+            seen_blocks.discard(block.hash)
+        elif status == ORPHAN:
+            add_log("block chưa có parent, chờ parent / sync")
+            # nhiều orphan liên tiếp chỉ gây 1 lần sync (+ tối đa 1 lần chạy lại)
+            sync_scheduler.request("orphan block")
+        elif status == SIDE:
+            add_log("block hợp lệ, thuộc nhánh phụ")
+        elif status in (ADDED, REORG):
+            stop_mining_event.set()
+            add_log("block hợp lệ, đã thêm vào blockchain"
+                    if status == ADDED else "đã đổi sang nhánh có nhiều work hơn")
+
+    def block_worker():
+        while True:
+            block = block_inbox.get()
+            try:
+                process_block(block)
+            except Exception as e:
+                print("Lỗi xử lý block từ peer:", e)
+
+    threading.Thread(target=block_worker, daemon=True, name="block-inbox").start()
 
     # ---------- ROUTES ----------
 
@@ -25,6 +121,20 @@ def register_routes(app, blockchain, peers, memPool, add_log, stop_mining_event)
             "message": "Node blockchain đang chạy",
             "peers": list(peers),
             "chain_length": len(blockchain.chain),
+            "difficulty": blockchain.difficulty,
+            "wallet_address": wallet_address,
+            "block_tree": blockchain.tree.stats(),
+        })
+
+    @app.route("/logs", methods=["GET"])
+    def get_logs():
+        """?since=<seq>: các dòng log mới hơn seq (dashboard đọc dần)."""
+        if log_sink is None:
+            return jsonify({"error": "Node không bật log sink"}), 404
+        since = request.args.get("since", default=0, type=int)
+        return jsonify({
+            "last_seq": log_sink.last_seq,
+            "logs": log_sink.since(since),
         })
 
     @app.route("/peers", methods=["GET"])
@@ -33,67 +143,231 @@ def register_routes(app, blockchain, peers, memPool, add_log, stop_mining_event)
             "peers": list(peers)
         })
 
+    def get_chain_page():
+        """
+        Một trang của chain (JSON), kích thước tối đa MAX_RANGE block:
+        - ?from=&to=&limit=: tăng dần theo height, next_from để lấy trang kế
+        - ?cursor=: lùi từ tip (cursor rỗng / "tip"), mới nhất trước;
+          next_cursor là hash block cũ nhất vừa trả, còn nguyên khi có block mới ở tip
+        - ?fields=headers: chỉ header, không kèm transactions
+        """
+        fields = request.args.get("fields", "full")
+        if fields not in ("full", "headers"):
+            return jsonify({"error": "fields phải là full hoặc headers"}), 400
+        serialize = Block.header_dict if fields == "headers" else Block.to_dict
+        chain = blockchain.snapshot()
+
+        if "cursor" in request.args:
+            cursor = request.args.get("cursor")
+            if cursor in ("", "tip"):
+                end = len(chain)
+            else:
+                end = blockchain.chain_index.height_of(cursor)
+                if end is None or end >= len(chain) or chain[end].hash != cursor:
+                    return jsonify({"error": "cursor không còn nằm trên chain (reorg?)"}), 410
+            start = max(0, end - _limit_arg())
+            blocks = chain[start:end][::-1]
+            return jsonify({
+                "length": len(chain),
+                "fields": fields,
+                "chain": [serialize(block) for block in blocks],
+                "next_cursor": blocks[-1].hash if blocks and start > 0 else None,
+            })
+
+        start, end = _range_args(len(chain))
+        return jsonify({
+            "length": len(chain),
+            "fields": fields,
+            "from": start,
+            "to": end,
+            "chain": [serialize(block) for block in chain[start:end]],
+            "next_from": end if end < len(chain) else None,
+        })
+
     @app.route("/chain", methods=["GET"])
     def get_chain():
+        """
+        Toàn bộ chain, stream từ cache JSON theo block (chunked).
+        Có from / to / limit / fields / cursor -> trả 1 trang (get_chain_page).
+        Accept: wire.CONTENT_TYPE -> định dạng nhị phân.
+        ETag = length + hash tip; peer gửi If-None-Match khớp -> 304.
+        """
+        if any(key in request.args for key in ("from", "to", "limit", "fields", "cursor")):
+            return get_chain_page()
+
+        use_wire = _wants_wire()
+        cache = wire_cache if use_wire else chain_cache
+        etag, encoded = cache.snapshot()
+        if use_wire:
+            etag = f"wire-{etag}"
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+
+        if use_wire:
+            response = Response(wire.stream_blocks(encoded), mimetype=wire.CONTENT_TYPE)
+        else:
+            response = Response(chain_cache.stream(encoded), mimetype="application/json")
+        response.set_etag(etag)
+        response.vary.add("Accept")
+        return response
+
+    @app.route("/tip", methods=["GET"])
+    def get_tip():
+        chain = blockchain.snapshot()
+        return jsonify({
+            "length": len(chain),
+            "hash": chain[-1].hash,
+            "wire": True,
+        })
+
+    @app.route("/headers", methods=["GET"])
+    def get_headers():
+        chain = blockchain.snapshot()
+        start, end = _range_args(len(chain))
+        return jsonify({
+            "length": len(chain),
+            "from": start,
+            "headers": [block.header_dict() for block in chain[start:end]],
+        })
+
+    @app.route("/blocks/range", methods=["GET"])
+    def get_blocks_range():
+        chain = blockchain.snapshot()
+        start, end = _range_args(len(chain))
+        if _wants_wire():
+            return Response(wire.encode_blocks(chain[start:end], len(chain), start),
+                            mimetype=wire.CONTENT_TYPE)
         return jsonify({
-            "length": len(blockchain.chain),
-            "chain": blockchain.to_dict()
+            "length": len(chain),
+            "from": start,
+            "blocks": [block.to_dict() for block in chain[start:end]],
         })
 
     @app.route("/transactions/new", methods=["POST"])
     def new_transaction():
      
-        data = request.get_json()
+        if _is_wire_body():
+            try:
+                tx_id, transaction = wire.decode_tx(request.get_data())
+            except ValueError as e:
+                return jsonify({"message": str(e)}), 400
+        else:
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict):
+                data = {}
+            tx_id = data.get("tx_id")
+            transaction = data.get("transaction")
 
-        tx_id = data.get("tx_id")
         if not tx_id:
             return jsonify({"message": "Missing tx_id"}), 400
+        if not isinstance(transaction, dict):
+            return jsonify({"message": "Transaction phải là object JSON"}), 400
         
-        if tx_id in seen_tx:
+        if seen_tx.check_and_add(tx_id):
             return jsonify({"message": "Tx already seen"}), 200
 
         add_log("nhận được thông tin 1 giao dịch")
-        seen_tx.add(tx_id)
-        memPool.append(data.get("transaction"))
-
-        for peer in list(peers):
-            url = f"{peer}/transactions/new"
-            try:
-                requests.post(url, json={
-                    "tx_id": tx_id,
-                    "transaction": data.get("transaction")
-                }, timeout=3)
-            except Exception as e:
-                print(f"⚠ Không gửi được giao dịch tới {peer}: {e}")
+        if not memPool.add(tx_id, transaction):
+            # chưa vào mempool -> client / peer gửi lại phải được xử lý lại
+            seen_tx.discard(tx_id)
+            return jsonify({"message": "Mempool đầy, giao dịch bị từ chối"}), 503
 
+        # relay song song, không chờ peer trả lời
+        gossip.broadcast(peers, "/transactions/new", json={
+            "tx_id": tx_id,
+            "transaction": transaction
+        }, wire=wire.encode_tx(tx_id, transaction))
 
         return jsonify({"message": "Đã thêm transaction vào pending"}), 201
 
+    @app.route("/transactions/batch", methods=["POST"])
+    def new_transactions_batch():
+        """
+        Body JSON: {"transactions": [{"tx_id": ..., "transaction": {...}}, ...]}
+        Thêm cả batch vào mempool một lần và relay cho peer trong 1 message.
+        """
+        data = request.get_json(silent=True) or {}
+        items = data.get("transactions")
+        if not isinstance(items, list):
+            return jsonify({"message": "Missing transactions"}), 400
+        if len(items) > MAX_TX_BATCH:
+            return jsonify({"message": f"Tối đa {MAX_TX_BATCH} giao dịch mỗi batch"}), 413
+
+        # kiểm tra cả batch trước khi đụng tới seen_tx
+        if any(not isinstance(item, dict) or not item.get("tx_id") for item in items):
+            return jsonify({"message": "Missing tx_id"}), 400
+        if any(not isinstance(item.get("transaction"), dict) for item in items):
+            return jsonify({"message": "Transaction phải là object JSON"}), 400
+
+        fresh = []
+        duplicates = 0
+        for item in items:
+            tx_id = item["tx_id"]
+            if seen_tx.check_and_add(tx_id):
+                duplicates += 1
+                continue
+            fresh.append({"tx_id": tx_id, "transaction": item.get("transaction")})
+
+        added = set(memPool.add_many((item["tx_id"], item["transaction"]) for item in fresh))
+        # chỉ giữ dấu "đã thấy" cho tx đã vào mempool, tx bị từ chối gửi lại được
+        for item in fresh:
+            if item["tx_id"] not in added:
+                seen_tx.discard(item["tx_id"])
+        accepted = [item for item in fresh if item["tx_id"] in added]
+        if accepted:
+            add_log(f"nhận được batch {len(accepted)} giao dịch")
+            gossip.broadcast(peers, "/transactions/batch", json={"transactions": accepted})
+
+        return jsonify({
+            "message": "Đã xử lý batch",
+            "accepted": len(accepted),
+            "duplicates": duplicates,
+            "rejected": len(fresh) - len(accepted),
+        }), 201
+
     @app.route("/blocks/receive", methods=["POST"])
     def receive_block():
         """
         Nhận block từ node khác.
         Body JSON: block dict
         """
-        block_data = request.get_json()
-        add_log("nhận được block từ node khác")
+        if _is_wire_body():
+            # wire: hash nằm trong header cố định, decode rồi mới kiểm tra trùng
+            try:
+                block = wire.decode_block(request.get_data())
+            except Exception as e:
+                add_log("block không hợp lệ")
+                return jsonify({"error": f"Block data không hợp lệ: {e}"}), 400
+            if seen_blocks.check_and_add(block.hash):
+                return jsonify({"message": "Block already seen"}), 200
+            add_log("nhận được block từ node khác")
+        else:
+            block_data = request.get_json()
+            # block trùng -> bỏ trước khi from_dict / validate
+            block_hash = block_data.get("hash") if isinstance(block_data, dict) else None
+            if block_hash and seen_blocks.check_and_add(block_hash):
+                return jsonify({"message": "Block already seen"}), 200
+
+            add_log("nhận được block từ node khác")
+            try:
+                block = Block.from_dict(block_data)
+            except Exception as e:
+                add_log("block không hợp lệ")
+                # hash do peer khai báo: bản hỏng không được chặn block thật cùng hash
+                if block_hash:
+                    seen_blocks.discard(block_hash)
+                return jsonify({"error": f"Block data không hợp lệ: {e}"}), 400
+
         try:
-            block = Block.from_dict(block_data)
-        except Exception as e:
-            add_log("block không hợp lệ")
-            return jsonify({"error": f"Block data không hợp lệ: {e}"}), 400
+            block_inbox.put_nowait(block)
+        except queue.Full:
+            # chưa xếp hàng -> peer gửi lại phải được nhận
+            seen_blocks.discard(block.hash)
+            return jsonify({"message": "Node đang bận, thử lại sau"}), 503
 
-        ok = blockchain.add_block_from_peer(block)
-        if not ok:
-            sync_chain = threading.Thread(target=blockchain.sync_chain, args=(peers, add_log,))
-            sync_chain.start()
-            add_log("block không hợp lệ")
-            return jsonify({"message": "Block bị từ chối"}), 400
-        
-        stop_mining_event.set()
-        add_log("block hợp lệ, đã thêm vào blockchain")
-    
-        return jsonify({"message": "Đã nhận và thêm block từ peer"}), 201
+        return jsonify({"message": "Đã nhận block, đang xử lý"}), 202
 
     @app.route("/peers/add", methods=["POST"])
     def add_peer():
@@ -111,29 +385,128 @@ def register_routes(app, blockchain, peers, memPool, add_log, stop_mining_event)
         add_log("có 1 node tham gia vào mạng lưới")
         return jsonify({"message": "Đã thêm peer", "peers": list(peers)}), 201
 
+    @app.route("/blocks/<int:height>/proof/<int:position>", methods=["GET"])
+    def get_tx_proof(height, position):
+        """
+        Merkle inclusion proof cho transaction thứ `position` trong block `height`.
+        """
+        block = blockchain.get_block(height)
+        if block is None:
+            return jsonify({"error": "Không có block ở height này"}), 404
+        if position < 0 or position >= len(block.transactions):
+            return jsonify({"error": "Không có transaction ở vị trí này"}), 404
+        try:
+            proof = block.tx_proof(position)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        return jsonify({
+            "block_hash": block.hash,
+            "merkle_root": block.merkle_root,
+            "position": position,
+            "transaction": block.transactions[position].to_dict(),
+            "proof": proof,
+        }), 200
+
+    @app.route("/blocks/<block_hash>", methods=["GET"])
+    def get_block_by_hash(block_hash):
+        block = blockchain.get_block_by_hash(block_hash)
+        if block is None:
+            return jsonify({"error": "Không có block với hash này"}), 404
+        return jsonify(block.to_dict()), 200
+
+    @app.route("/blocks/height/<int:height>", methods=["GET"])
+    def get_block_by_height(height):
+        block = blockchain.get_block(height)
+        if block is None:
+            return jsonify({"error": "Không có block ở height này"}), 404
+        return jsonify(block.to_dict()), 200
+
+    @app.route("/tx/<tx_id>", methods=["GET"])
+    def get_transaction(tx_id):
+        """Tx theo tx_id (gossip tx_id, hoặc hash lá merkle với tx không có tx_id)."""
+        found = blockchain.find_transaction(tx_id)
+        if not found:
+            return jsonify({"error": "Không tìm thấy transaction"}), 404
+        block, position = found[-1]
+        data = _tx_location(block, position)
+        data["tx_id"] = tx_id
+        data["confirmations"] = len(blockchain.chain) - block.index
+        # tx_id lặp (vd tx thưởng giống hệt nhau) -> liệt kê mọi vị trí
+        data["locations"] = [{"height": b.index, "position": p} for b, p in found]
+        return jsonify(data), 200
+
+    @app.route("/address/<address>/history", methods=["GET"])
+    def get_address_history(address):
+        """?offset=&limit=: giao dịch của address, mới nhất trước."""
+        offset = max(0, request.args.get("offset", default=0, type=int))
+        limit = min(max(1, request.args.get("limit", default=50, type=int)), MAX_RANGE)
+        total, page = blockchain.get_address_history(address, offset, limit)
+        return jsonify({
+            "address": address,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "transactions": [_tx_location(block, position) for block, position in page],
+        }), 200
+
+    @app.route("/watch/<address>", methods=["GET"])
+    def watch_balance(address):
+        """
+        Long-poll: ?balance=&tip= là trạng thái client đang có.
+        Trả về ngay khi balance hoặc tip khác, hoặc sau ?timeout= giây.
+        """
+        known_balance = request.args.get("balance", type=float)
+        known_tip = request.args.get("tip")
+        timeout = request.args.get("timeout", default=25, type=float)
+        timeout = min(max(timeout, 0), MAX_WATCH_TIMEOUT)
+        if not watch_slots.acquire(blocking=False):
+            # hết chỗ long-poll -> client quay về poll /balance
+            response = jsonify({"message": "Quá nhiều client đang watch, thử lại sau"})
+            response.headers["Retry-After"] = "5"
+            return response, 503
+        try:
+            state = chain_watch.wait(address, known_balance, known_tip, timeout)
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+        finally:
+            watch_slots.release()
+        return jsonify(state), 200
+
+    @app.route("/gossip/stats", methods=["GET"])
+    def gossip_stats():
+        return jsonify({
+            "peers": gossip.stats(),
+            "seen": {
+                "transactions": seen_tx.stats(),
+                "blocks": seen_blocks.stats(),
+            },
+        }), 200
+
+    @app.route("/sync/stats", methods=["GET"])
+    def sync_stats():
+        return jsonify(sync_scheduler.stats()), 200
+
     @app.route("/balance/<address>", methods=["GET"])
     def get_balance(address):
         try:
             bal = blockchain.get_balance(address)
             return jsonify({
                 "address": address,
-                "balance": bal
+                "balance": bal,
+                "tx_count": blockchain.get_tx_count(address),
             }), 200
         except Exception as e:
             return jsonify({
                 "error": str(e)
             }), 500
 
-def broadcast_new_block(block, peers):
+def broadcast_new_block(block, peers, gossip=None):
     """
     Hàm gửi block mới đã mine tới tất cả peers.
     (Không phải route, chỉ là helper được dùng trong /mine)
+    Gửi song song qua GossipDispatcher, không chờ kết quả.
     """
-    block_data = block.to_dict()
-    for peer in list(peers):
-        url = f"{peer}/blocks/receive"
-        try:
-            res = requests.post(url, json=block_data, timeout=3)
-            print(f"→ Gửi block tới {peer}, status {res.status_code}")
-        except Exception as e:
-            print(f"⚠ Không gửi được block tới {peer}: {e}")
+    gossip = gossip or get_dispatcher()
+    return gossip.broadcast(peers, "/blocks/receive", json=block.to_dict(),
+                            wire=wire.encode_block(block))
@@ -0,0 +1,129 @@
+# balance_index.py
+from collections import deque
+
+# số block gần tip giữ dữ liệu undo (reorg sâu hơn -> rebuild)
+UNDO_DEPTH = 1000
+# address chưa có trong index: (balance, số giao dịch, lỗi amount)
+_EMPTY = (0, 0, None)
+
+
+class BalanceIndex:
+    """
+    Index address -> (balance, số giao dịch, lỗi amount), cập nhật theo từng block.
+    Thứ tự cộng/trừ giống hệt vòng quét cũ trong Blockchain.get_balance
+    nên kết quả float trùng khớp tuyệt đối.
+
+    Reader không cần lock: giá trị mới của mọi address được tính riêng rồi mới
+    ghi vào index, mỗi address 1 lần gán (atomic), nên không bao giờ thấy
+    trạng thái nửa chừng của 1 block hay 1 lần đổi nhánh; rebuild dựng dict mới rồi thay.
+    Mỗi block giữ giá trị cũ của các address nó đụng tới, nên đổi nhánh
+    khôi phục chính xác (không trừ float) trong O(số tx của các block đổi).
+    """
+
+    def __init__(self, undo_depth=UNDO_DEPTH):
+        self._state = {}
+        # (block hash, {address: giá trị trước block}), tip ở cuối
+        self._undo = deque(maxlen=undo_depth)
+
+    def clear(self):
+        self._state = {}
+        self._undo = deque(maxlen=self._undo.maxlen)
+
+    @staticmethod
+    def _play(blocks, state, current, undo):
+        """
+        Áp blocks lên `state` (address -> [balance, số giao dịch, lỗi]);
+        address chưa có trong state lấy từ current(address). Ghi undo từng block.
+        """
+        for block in blocks:
+            previous = {}
+            for tx in block.transactions:
+                receiver = tx.get("to")
+                sender = tx.get("from")
+                for address in (receiver, sender):
+                    if isinstance(address, str):
+                        if address not in state:
+                            state[address] = list(current(address))
+                        if address not in previous:
+                            previous[address] = tuple(state[address])
+
+                try:
+                    amount = float(tx.get("amount", 0))
+                except (TypeError, ValueError) as e:
+                    amount = None
+                    error = e
+
+                for address, sign in ((receiver, 1), (sender, -1)):
+                    if not isinstance(address, str):
+                        continue
+                    values = state[address]
+                    if amount is None:
+                        if values[2] is None:
+                            values[2] = error
+                        continue
+                    values[0] = values[0] + sign * amount
+
+                if isinstance(receiver, str):
+                    state[receiver][1] += 1
+                if isinstance(sender, str) and sender != receiver:
+                    state[sender][1] += 1
+            undo.append((block.hash, previous))
+
+    def _current(self, address):
+        return self._state.get(address, _EMPTY)
+
+    def _commit(self, state):
+        for address, values in state.items():
+            if tuple(values) == _EMPTY:
+                self._state.pop(address, None)
+            else:
+                self._state[address] = tuple(values)
+
+    def apply_block(self, block):
+        state = {}
+        self._play([block], state, self._current, self._undo)
+        self._commit(state)
+
+    def switch_branch(self, rolled, branch):
+        """
+        Bỏ các block `rolled` (đang ở tip, cũ trước) rồi áp `branch`.
+        False nếu không đủ dữ liệu undo -> caller phải rebuild.
+        """
+        if len(rolled) > len(self._undo):
+            return False
+        tail = list(self._undo)[len(self._undo) - len(rolled):]
+        if [block_hash for block_hash, _ in tail] != [block.hash for block in rolled]:
+            return False
+
+        # giá trị trước block cũ nhất bị bỏ = giá trị tại điểm rẽ nhánh
+        state = {}
+        for _, previous in reversed(tail):
+            for address, values in previous.items():
+                state[address] = list(values)
+        undo = []
+        self._play(branch, state, self._current, undo)
+
+        for _ in rolled:
+            self._undo.pop()
+        self._undo.extend(undo)
+        self._commit(state)
+        return True
+
+    def rebuild(self, chain):
+        state = {}
+        undo = deque(maxlen=self._undo.maxlen)
+        self._play(chain, state, lambda address: _EMPTY, undo)
+        self._state = {address: tuple(values) for address, values in state.items()}
+        self._undo = undo
+
+    def balance(self, address):
+        balance, _, error = self._state.get(address, _EMPTY)
+        if error is not None:
+            raise ValueError(error)
+        return balance
+
+    def tx_count(self, address):
+        return self._state.get(address, _EMPTY)[1]
+
+    def addresses(self):
+        return set(self._state)
@@ -0,0 +1,75 @@
+# bench_memory.py
+"""
+Đo bộ nhớ (tracemalloc) cho mỗi block khi giữ cả chain trong RAM:
+- "dict":  block dạng dict parse từ JSON (tương đương Block cũ có __dict__ + tx là dict)
+- "block": Block (__slots__) + Transaction (address intern, JSON chuẩn hoá đã cache)
+Dữ liệu đi qua JSON như khi nhận từ peer / nạp từ store, nên mỗi address
+là 1 object str riêng trước khi intern.
+
+    python bench_memory.py --blocks 100000 --txs 4
+"""
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+
+from block import Block
+
+
+def make_payloads(n_blocks, n_txs, n_addresses=1000, seed=1):
+    """JSON của từng block (không cần đào, hash chỉ để có đủ field)."""
+    rng = random.Random(seed)
+    addresses = [f"{rng.getrandbits(160):040x}" for _ in range(n_addresses)]
+    previous_hash = "0" * 64
+    payloads = []
+    for i in range(1, n_blocks + 1):
+        txs = [{
+            "from": rng.choice(addresses),
+            "to": rng.choice(addresses),
+            "amount": rng.randint(1, 1000),
+        } for _ in range(n_txs)]
+        txs.append({"from": "SYSTEM", "to": rng.choice(addresses), "amount": 10})
+        block = Block(i, time.time(), txs, previous_hash, nonce=rng.randint(0, 10**6))
+        previous_hash = block.hash
+        payloads.append(json.dumps(block.to_dict()))
+    return payloads
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    chain = build()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, elapsed, chain
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark bộ nhớ cho mỗi block")
+    parser.add_argument("--blocks", type=int, default=100_000)
+    parser.add_argument("--txs", type=int, default=4, help="số tx mỗi block (chưa tính tx thưởng)")
+    args = parser.parse_args()
+
+    print(f"Tạo {args.blocks} block, {args.txs + 1} tx/block...")
+    payloads = make_payloads(args.blocks, args.txs)
+    payload_bytes = sum(len(p) for p in payloads)
+    print(f"payload JSON: {payload_bytes / args.blocks:,.0f} bytes/block\n")
+
+    print(f"{'format':<8}{'bytes/block':>14}{'x payload':>12}{'build (s)':>12}")
+    for name, build in (
+        ("dict", lambda: [json.loads(p) for p in payloads]),
+        ("block", lambda: [Block.from_dict(json.loads(p)) for p in payloads]),
+    ):
+        size, elapsed, chain = measure(build)
+        per_block = size / len(chain)
+        print(f"{name:<8}{per_block:>14,.0f}{per_block / (payload_bytes / args.blocks):>12.2f}{elapsed:>12.2f}")
+        del chain
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# bench_wire.py
+"""
+So sánh JSON (to_dict/from_dict) với định dạng wire nhị phân:
+tốc độ encode / decode và kích thước payload của 1 danh sách block.
+
+    python bench_wire.py --blocks 500 --txs 200
+"""
+import argparse
+import json
+import random
+import time
+
+import wire
+from block import Block
+
+
+def make_chain(n_blocks, n_txs, seed=1):
+    rng = random.Random(seed)
+    chain = [Block.create_genesis_block()]
+    addresses = [f"{rng.getrandbits(160):040x}" for _ in range(200)]
+    for i in range(1, n_blocks):
+        txs = [{
+            "from": rng.choice(addresses),
+            "to": rng.choice(addresses),
+            "amount": rng.randint(1, 1000),
+        } for _ in range(n_txs)]
+        txs.append({"from": "SYSTEM", "to": rng.choice(addresses), "amount": 10})
+        chain.append(Block(i, time.time(), txs, chain[-1].hash, nonce=rng.randint(0, 10**6)))
+    return chain
+
+
+def encode_json(chain):
+    return json.dumps({"length": len(chain), "chain": [b.to_dict() for b in chain]}).encode("utf-8")
+
+
+def decode_json(data):
+    return [Block.from_dict(b) for b in json.loads(data)["chain"]]
+
+
+def encode_wire(chain):
+    return wire.encode_blocks(chain, len(chain))
+
+
+def decode_wire(data):
+    return wire.decode_blocks(data)[2]
+
+
+def best_of(fn, arg, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(arg)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark JSON vs wire nhị phân")
+    parser.add_argument("--blocks", type=int, default=500)
+    parser.add_argument("--txs", type=int, default=200, help="số tx mỗi block")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    chain = make_chain(args.blocks, args.txs)
+    n_txs = sum(len(b.transactions) for b in chain)
+    print(f"{len(chain)} block, {n_txs} tx, lấy thời gian tốt nhất sau {args.repeat} lần\n")
+    print(f"{'format':<8}{'bytes':>14}{'encode (s)':>14}{'decode (s)':>14}{'enc MB/s':>12}{'dec MB/s':>12}")
+
+    for name, encode, decode in (("json", encode_json, decode_json), ("wire", encode_wire, decode_wire)):
+        enc_time, data = best_of(encode, chain, args.repeat)
+        dec_time, decoded = best_of(decode, data, args.repeat)
+        assert [b.hash for b in decoded] == [b.hash for b in chain], f"{name}: round-trip sai"
+        mb = len(data) / 1e6
+        print(f"{name:<8}{len(data):>14,}{enc_time:>14.4f}{dec_time:>14.4f}"
+              f"{mb / enc_time:>12.1f}{mb / dec_time:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
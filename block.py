@@ -1,60 +1,223 @@
 # block.py
 import hashlib
 import json
+import math
+import re
 import time
+from merkle import merkle_root_checked, merkle_proof
+from transaction import Transaction
+
+_HASH = re.compile(r"[0-9a-f]{64}")
+# int lớn hơn không biểu diễn chính xác được bằng float64 (timestamp trong wire)
+_MAX_EXACT_INT = 2 ** 53
+_MAX_UINT64 = 2 ** 64
+
+# giá trị giữ chỗ cho nonce khi dựng template hash (json escape thành \u0000...)
+_NONCE_PLACEHOLDER = "\x00nonce\x00"
 
 
 class Block:
-    def __init__(self, index, timestamp, transactions, previous_hash, nonce=0, block_hash=None):
+    # v1: hash trên toàn bộ transactions (định dạng cũ, genesis vẫn dùng)
+    # v2: hash trên header cố định, header cam kết merkle root của transactions
+    LEGACY_VERSION = 1
+    MERKLE_VERSION = 2
+
+    # không có __dict__ cho mỗi block (chain có thể rất dài)
+    __slots__ = ("index", "timestamp", "transactions", "previous_hash", "nonce", "version",
+                 "merkle_root", "hash")
+
+    def __init__(self, index, timestamp, transactions, previous_hash, nonce=0, block_hash=None,
+                 version=MERKLE_VERSION, merkle_root=None):
         self.index = index
         self.timestamp = timestamp
-        self.transactions = transactions      
+        # dict -> Transaction (gọn hơn, cache JSON chuẩn hoá)
+        self.transactions = [Transaction.from_dict(tx) for tx in transactions]
         self.previous_hash = previous_hash
         self.nonce = nonce
+        self.version = version
+        # merkle_root truyền vào chỉ dùng cho dữ liệu tin cậy (block đã kiểm tra trong store)
+        self.merkle_root = merkle_root
+        if version >= Block.MERKLE_VERSION and merkle_root is None:
+            self.merkle_root, mutated = merkle_root_checked(transactions)
+            if mutated:
+                # cùng root với danh sách không lặp -> peer có thể nhân đôi tx mà hash block không đổi
+                raise ValueError("transactions có cặp lá merkle trùng nhau")
         self.hash = block_hash or self.calculate_hash()
 
-    def calculate_hash(self):
-        payload = {
-            "index": int(self.index),
-            "timestamp": self.timestamp,          # hoặc ép int, xem ghi chú dưới
-            "transactions": self.transactions,
-            "previous_hash": self.previous_hash,
-            "nonce": int(self.nonce),
+    @staticmethod
+    def _header_payload(version, index, timestamp, merkle_root, previous_hash, nonce):
+        return {
+            "version": int(version),
+            "index": int(index),
+            "timestamp": timestamp,
+            "merkle_root": merkle_root,
+            "previous_hash": previous_hash,
+            "nonce": nonce,
         }
+
+    def _canonical(self, nonce):
+        if self.version >= Block.MERKLE_VERSION:
+            payload = Block._header_payload(self.version, self.index, self.timestamp,
+                                            self.merkle_root, self.previous_hash, nonce)
+        else:
+            payload = {
+                "index": int(self.index),
+                "timestamp": self.timestamp,          # hoặc ép int, xem ghi chú dưới
+                "transactions": self.transaction_dicts(),
+                "previous_hash": self.previous_hash,
+                "nonce": nonce,
+            }
+        return json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+    def calculate_hash(self):
+        canonical = self._canonical(int(self.nonce))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def header_fields(self):
+        """(version, index, timestamp, merkle_root, previous_hash, nonce) – đủ để hash block v2."""
+        return (self.version, self.index, self.timestamp, self.merkle_root, self.previous_hash,
+                int(self.nonce))
+
+    @staticmethod
+    def hash_header(version, index, timestamp, merkle_root, previous_hash, nonce):
+        """Hash block v2 chỉ từ header (không cần transactions)."""
+        payload = Block._header_payload(version, index, timestamp, merkle_root, previous_hash, nonce)
         canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
         return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
 
+    def hash_template(self):
+        """
+        Serialize payload một lần, tách phần bytes trước/sau nonce.
+        Trả về (prefix, suffix) sao cho
+        sha256(prefix + str(nonce) + suffix) == calculate_hash().
+        """
+        marker = json.dumps(_NONCE_PLACEHOLDER)
+        canonical = self._canonical(_NONCE_PLACEHOLDER)
+        key = '"nonce":' + marker
+        if canonical.count(marker) != 1 or key not in canonical:
+            return None
+        prefix, suffix = canonical.split(marker)
+        return prefix.encode("utf-8"), suffix.encode("utf-8")
+
     def mine(self, difficulty, stop_mining_event):
         target_prefix = "0" * difficulty
+        template = self.hash_template()
+        if template is None:
+            # hiếm: transaction chứa đúng chuỗi giữ chỗ -> quay về cách cũ
+            while not stop_mining_event.is_set():
+                self.hash = self.calculate_hash()
+                if self.hash.startswith(target_prefix):
+                    break
+                self.nonce += 1
+            return
+
+        prefix, suffix = template
+        prefix_state = hashlib.sha256(prefix)
         while not stop_mining_event.is_set():
-            self.hash = self.calculate_hash()
+            h = prefix_state.copy()
+            h.update(str(int(self.nonce)).encode("ascii"))
+            h.update(suffix)
+            self.hash = h.hexdigest()
             if self.hash.startswith(target_prefix):
                 break
             self.nonce += 1
 
+    def tx_proof(self, position):
+        """Merkle proof cho transaction thứ `position` (chỉ block v2)."""
+        if self.merkle_root is None:
+            raise ValueError("Block legacy không có merkle root")
+        return merkle_proof(self.transactions, position)
+
     @staticmethod
     def create_genesis_block():
         return Block(
             index=0,
             timestamp=1672531200,
             transactions=[{"from": "System", "to": "Genesis", "amount": 0}],
-            previous_hash="0" * 64
+            previous_hash="0" * 64,
+            version=Block.LEGACY_VERSION,
         )
 
     def to_dict(self):
         """Dùng để serialize block gửi cho node khác (JSON)"""
-        return {
+        data = {
             "index": self.index,
             "timestamp": self.timestamp,
-            "transactions": self.transactions,
+            "transactions": self.transaction_dicts(),
             "previous_hash": self.previous_hash,
             "nonce": self.nonce,
             "hash": self.hash,
         }
+        # block legacy giữ nguyên định dạng cũ
+        if self.version >= Block.MERKLE_VERSION:
+            data["version"] = self.version
+            data["merkle_root"] = self.merkle_root
+        return data
+
+    def transaction_dicts(self):
+        return [tx.to_dict() for tx in self.transactions]
+
+    def transactions_json(self):
+        """List transactions dạng JSON, ghép từ JSON chuẩn hoá đã cache của từng tx."""
+        return "[" + ",".join(tx.canonical() for tx in self.transactions) + "]"
+
+    def header_dict(self):
+        """Header không kèm transactions, dùng cho headers-first sync."""
+        data = self.to_dict()
+        del data["transactions"]
+        data["tx_count"] = len(self.transactions)
+        return data
+
+    @staticmethod
+    def _check_fields(data):
+        """
+        Kiểu / miền giá trị của header từ peer; JSON cho phép bất kỳ giá trị nào
+        nhưng wire đóng gói cố định (uint8 version, uint64 index / nonce, float64 timestamp).
+        """
+        def is_int(value, low, high):
+            return type(value) is int and low <= value < high
+
+        if not is_int(data.get("version", Block.LEGACY_VERSION), 0, 256):
+            raise ValueError("version không hợp lệ")
+        if not is_int(data["index"], 0, _MAX_UINT64):
+            raise ValueError("index không hợp lệ")
+        if not is_int(data["nonce"], 0, _MAX_UINT64):
+            raise ValueError("nonce không hợp lệ")
+        timestamp = data["timestamp"]
+        if not (is_int(timestamp, -_MAX_EXACT_INT, _MAX_EXACT_INT)
+                or (type(timestamp) is float and math.isfinite(timestamp))):
+            raise ValueError("timestamp không hợp lệ")
+        for key in ("previous_hash", "hash"):
+            if not isinstance(data[key], str) or not _HASH.fullmatch(data[key]):
+                raise ValueError(f"{key} phải là 64 ký tự hex thường")
+        if not isinstance(data["transactions"], list) or len(data["transactions"]) >= 2 ** 32:
+            raise ValueError("transactions phải là list")
 
     @staticmethod
     def from_dict(data: dict):
         """Dùng để dựng lại Block khi nhận JSON từ node khác"""
+        Block._check_fields(data)
+        block = Block(
+            index=data["index"],
+            timestamp=data["timestamp"],
+            transactions=data["transactions"],
+            previous_hash=data["previous_hash"],
+            nonce=data["nonce"],
+            block_hash=data["hash"],
+            version=data.get("version", Block.LEGACY_VERSION),
+        )
+        # merkle root luôn được tính lại từ transactions, không tin dữ liệu gửi tới
+        if "merkle_root" in data and data["merkle_root"] != block.merkle_root:
+            raise ValueError("merkle_root không khớp với transactions")
+        return block
+
+    @staticmethod
+    def from_trusted_dict(data: dict):
+        """
+        Dựng lại Block do chính node đã kiểm tra rồi ghi ra (ChainStore):
+        bỏ kiểm tra kiểu và không tính lại merkle root (dùng root đã lưu).
+        """
+        version = data.get("version", Block.LEGACY_VERSION)
         return Block(
             index=data["index"],
             timestamp=data["timestamp"],
@@ -62,4 +225,6 @@ class Block:
             previous_hash=data["previous_hash"],
             nonce=data["nonce"],
             block_hash=data["hash"],
+            version=version,
+            merkle_root=data["merkle_root"] if version >= Block.MERKLE_VERSION else None,
         )
@@ -1,14 +1,80 @@
 # blockchain.py
 from block import Block
+from balance_index import BalanceIndex
+from chain_index import ChainIndex, tx_id_of, tx_addresses
+from block_tree import (BlockTree, block_work, ADDED, REORG, SIDE, ORPHAN, DUPLICATE,
+                        INVALID)
+from parallel_miner import ParallelMiner, pool_context
+from chain_validator import ChainValidator
+from chain_view import ChainView
+from gossip import get_dispatcher
+import wire
+import threading
 import time
-import requests
+
+# số header so sánh ở lần đầu khi tìm điểm rẽ nhánh
+SYNC_FORK_WINDOW = 16
+# thời gian chờ tối đa cho bước hỏi tip các peer (giây)
+SYNC_TIP_TIMEOUT = 2
+# giới hạn tx (không tính tx thưởng) và bytes cho 1 block
+MAX_BLOCK_TXS = 1000
+MAX_BLOCK_BYTES = 1024 * 1024
+# sender của tx thưởng do miner tự thêm (không trả về mempool khi đổi nhánh)
+REWARD_SENDER = "SYSTEM"
+
+
+class InvalidChainError(Exception):
+    """Peer đưa ra chain không hợp lệ (validate hỏng / không có điểm chung với chain local)."""
 
 
 class Blockchain:
-    def __init__(self, difficulty=3):
+    def __init__(self, difficulty=3, mining_workers=1, verify_balance_index=False, store=None,
+                 gossip=None, mempool=None, validation_workers=1):
         self.difficulty = difficulty
-        self.chain = [Block.create_genesis_block()]
+        # kiểm tra chain (song song khi validation_workers > 1), nhớ block đã kiểm tra
+        self.validator = ChainValidator(workers=validation_workers)
+        # Mempool (tuỳ chọn): tx nằm trong block mới được xoá khỏi mempool
+        self.mempool = mempool
+        # GossipDispatcher dùng để gọi HTTP tới peer khi sync
+        self.gossip = gossip or get_dispatcher()
+        # writer lock: mọi thay đổi tip (miner, block từ peer, sync) + các index đi kèm.
+        # Reader đọc chain qua snapshot (ChainView) nên không cần lock.
+        self._lock = threading.RLock()
+        self._publish([Block.create_genesis_block()])
         self._subscribers = []
+        # ChainStore (tuỳ chọn): lưu chain xuống đĩa, khởi động lại từ tip đã lưu
+        self.store = store
+        if store is not None:
+            self._load_from_store()
+        self.validator.remember(self.chain)
+        # address -> balance, cập nhật mỗi khi chain đổi
+        self.balance_index = BalanceIndex()
+        self.balance_index.rebuild(self.chain)
+        # block hash / tx_id / address -> vị trí trong chain
+        self.chain_index = ChainIndex()
+        self.chain_index.rebuild(self.chain)
+        # nhánh phụ + orphan (main chain vẫn là self.chain)
+        self.tree = BlockTree()
+        # True -> mỗi lần get_balance so sánh index với cách quét cũ
+        self.verify_balance_index = verify_balance_index
+        # mining_workers > 1 -> đào song song bằng process pool
+        self.mining_workers = mining_workers
+        self._parallel_miner = None
+        # peer -> (ETag của /chain lần tải toàn bộ gần nhất, chain đó không hợp lệ?)
+        # ETag gửi lại qua If-None-Match
+        self._chain_etags = {}
+
+    def start_workers(self):
+        """
+        Tạo sẵn process pool (đào / validate song song) khi process còn 1 thread,
+        để pool dùng fork an toàn thay vì spawn.
+        """
+        # chốt start method trước khi pool đầu tiên tạo thread quản lý của nó
+        pool_context()
+        if self.mining_workers > 1 and self._parallel_miner is None:
+            self._parallel_miner = ParallelMiner(workers=self.mining_workers)
+            self._parallel_miner.start()
+        self.validator.start()
 
     def subscribe(self, callback):
         if callback not in self._subscribers:
@@ -25,26 +91,147 @@ class Blockchain:
             except Exception as e:
                 print("Notify error:", e)
 
+    @property
+    def chain(self):
+        """Snapshot chỉ-đọc của main chain (ChainView), không đổi khi tip đổi sau đó."""
+        return self._view
+
+    def snapshot(self):
+        return self._view
+
     def get_latest_block(self):
-        return self.chain[-1]
+        return self._view[-1]
+
+    # ---------- THAY ĐỔI CHAIN (gọi khi đang giữ self._lock) ----------
+    def _publish(self, blocks):
+        self._blocks = blocks
+        self._view = ChainView(blocks)
+
+    def _append_block(self, block: Block):
+        # append nằm ngoài phạm vi mọi snapshot cũ -> không cần copy
+        self._blocks.append(block)
+        self._view = ChainView(self._blocks)
+        self.validator.remember([block])
+        self.balance_index.apply_block(block)
+        self.chain_index.apply_block(block)
+        if self.store is not None:
+            self.store.append(block)
+        if self.mempool is not None:
+            self.mempool.discard_included(block.transactions)
+
+    def _replace_chain(self, new_chain):
+        fork_height = self._fork_height(new_chain)
+        self._switch_branch(fork_height, new_chain[fork_height:])
+        # orphan có thể đang chờ 1 block vừa tải về
+        for block in new_chain[fork_height:]:
+            self._connect_orphans(block.hash)
+
+    def _switch_branch(self, fork_height, branch):
+        """
+        Thay chain[fork_height:] bằng branch, tốn O(độ sâu fork):
+        index + balance chỉ tính lại phần rẽ nhánh, block cũ chuyển sang nhánh phụ,
+        tx của block cũ trả về mempool.
+        Chain mới là list mới (copy-on-write), snapshot cũ vẫn giữ nguyên;
+        chain được publish trước index nên reader thấy index nào cũng có chain tương ứng.
+        """
+        rolled = self._blocks[fork_height:]
+        self._publish(self._blocks[:fork_height] + list(branch))
+        self.chain_index.switch_branch(fork_height, rolled, branch)
+        if not self.balance_index.switch_branch(rolled, branch):
+            # fork sâu hơn dữ liệu undo -> tính lại toàn bộ (hiếm)
+            self.balance_index.rebuild(self._blocks)
+
+        work = self._work_at(fork_height - 1)
+        for block in rolled:
+            work += block_work(self.difficulty)
+            self.tree.add_side(block, work)
+        for block in branch:
+            self.tree.remove_side(block.hash)
+        self.tree.prune(len(self.chain) - 1)
+
+        self.validator.remember(branch)
+        if self.store is not None:
+            self.store.replace_from(fork_height, branch)
+        if self.mempool is not None:
+            # trả trước, discard_included sau -> tx đã có trong nhánh mới không quay lại
+            self.mempool.restore(
+                (tx_id_of(tx), {key: value for key, value in tx.items() if key != "tx_id"})
+                for block in rolled for tx in block.transactions
+                if tx.get("from") != REWARD_SENDER
+            )
+            for block in branch:
+                self.mempool.discard_included(block.transactions)
+
+    def _work_at(self, height):
+        """Cumulative work của main chain tới height (difficulty cố định -> mỗi block như nhau)."""
+        return height * block_work(self.difficulty)
+
+    def _fork_height(self, other_chain):
+        """Height đầu tiên mà other_chain khác chain hiện tại."""
+        height = 0
+        limit = min(len(self.chain), len(other_chain))
+        while height < limit and self.chain[height].hash == other_chain[height].hash:
+            height += 1
+        return height
+
+    # ---------- LƯU TRỮ ----------
+    def _load_from_store(self):
+        """
+        Nạp chain từ store; chỉ kiểm tra lại `store.tail_check` block cuối
+        (phần trước đó đã được validate khi ghi).
+        """
+        blocks = self.store.load()
+        if not blocks or blocks[0].hash != self.chain[0].hash:
+            if blocks:
+                print("❌ Genesis trong store không khớp, bỏ store cũ")
+            self.store.replace_from(0, self.chain)
+            return
+
+        start = max(1, len(blocks) - self.store.tail_check)
+        for i in range(start, len(blocks)):
+            if not self.is_valid_new_block(blocks[i], blocks[i - 1]):
+                print(f"❌ Block {i} trong store không hợp lệ, cắt bỏ từ đây")
+                blocks = blocks[:i]
+                self.store.truncate(i)
+                break
+
+        self._publish(blocks)
+        print(f"✅ Đã nạp {len(blocks)} block từ store")
 
     # ---------- MINING (LOCAL NODE) ----------
-    def miner(self, tx_data: list, wallet_address: str, stop_event, add_log):
+    def miner(self, mempool, wallet_address: str, stop_event, add_log,
+              max_txs=MAX_BLOCK_TXS, max_bytes=MAX_BLOCK_BYTES):
         """
-        Tạo block mới từ tx_data (list),
+        Lấy 1 batch tx từ mempool (Mempool),
         thêm giao dịch thưởng cho miner,
-        đào block và add vào chain nếu hợp lệ
+        đào block và add vào chain nếu hợp lệ.
+        Đào thất bại / bị dừng -> trả tx lại mempool.
         """
 
         REWARD_AMOUNT = 10
         reward_tx = {
-            "from": "SYSTEM",
+            "from": REWARD_SENDER,
             "to": wallet_address,
             "amount": REWARD_AMOUNT
         }
 
-        # Copy tx_data để tránh race condition
-        block_transactions = list(tx_data)
+        # take_batch lấy và xoá tx dưới lock, không mất tx đến giữa chừng
+        entries = mempool.take_batch(max_txs=max_txs, max_bytes=max_bytes)
+        try:
+            new_block = self._mine_batch(entries, reward_tx, stop_event, add_log)
+        except Exception:
+            # lỗi bất kỳ khi dựng / đào / thêm block -> tx không được mất
+            mempool.put_back(entries)
+            raise
+        if new_block is None:
+            mempool.put_back(entries)
+            return None
+        self._notify()
+        return new_block
+
+    def _mine_batch(self, entries, reward_tx, stop_event, add_log):
+        """Dựng block từ entries + tx thưởng, đào rồi thêm vào chain. None nếu không thêm được."""
+        block_transactions = [entry.block_transaction() for entry in entries]
         block_transactions.append(reward_tx)
 
         previous_block = self.get_latest_block()
@@ -56,47 +243,124 @@ class Blockchain:
             previous_hash=previous_block.hash,
             nonce=0
         )
-        tx_data.clear()
         # ====== Đào block ======
         add_log("⛏️ Bắt đầu đào block...")
-        new_block.mine(self.difficulty, stop_mining_event=stop_event)
+        if self.mining_workers > 1:
+            if self._parallel_miner is None:
+                self._parallel_miner = ParallelMiner(workers=self.mining_workers)
+            report = self._parallel_miner.mine(new_block, self.difficulty, stop_event)
+            add_log(f"⛏️ {report.summary()}")
+        else:
+            new_block.mine(self.difficulty, stop_mining_event=stop_event)
 
         # ====== Nếu bị dừng ======
         if stop_event.is_set():
             add_log("⛔ Đã dừng đào")
             return None
 
-        # ====== Kiểm tra block ======
-        if self.is_valid_new_block(new_block, previous_block):
-            self.chain.append(new_block)
+        # ====== Kiểm tra tip + thêm block (atomic) ======
+        with self._lock:
+            stale = self.get_latest_block().hash != previous_block.hash
+            valid = not stale and self.is_valid_new_block(new_block, previous_block)
+            if valid:
+                self._append_block(new_block)
+
+        if valid:
             add_log("✅ Đào xong block mới")
-            self._notify()
             return new_block
+        if stale:
+            # tip đã đổi trong lúc đào (block từ peer / sync) -> block này không còn dùng được
+            add_log("⛔ Tip đã đổi trong lúc đào, bỏ block vừa đào")
         else:
             add_log("❌ Block không hợp lệ, không thêm vào chain")
-            return None
+        return None
 
 
     # ---------- NHẬN BLOCK TỪ NODE KHÁC ----------
     def add_block_from_peer(self, block: Block):
         """
         Khi node khác gửi block đã mine xong.
+        Trả về trạng thái trong block_tree: ADDED / REORG (tip đổi), SIDE,
+        ORPHAN (thiếu parent -> caller nên sync), DUPLICATE, INVALID.
         """
-        previous_block = self.get_latest_block()
-
-        # Block phải là block kế tiếp
-        if block.index != previous_block.index + 1:
-            print("❌ Block từ peer có index không khớp, bỏ qua.")
-            return False
+        if block.hash in self.tree or self.get_block_by_hash(block.hash) is not None:
+            return DUPLICATE
 
-        if not self.is_valid_new_block(block, previous_block):
+        # hash + PoW không cần lock
+        if not self.validator.check_block(block, self.difficulty):
             print("❌ Block từ peer không hợp lệ, bỏ qua.")
-            return False
+            return INVALID
+
+        with self._lock:
+            if block.hash in self.tree or self.get_block_by_hash(block.hash) is not None:
+                return DUPLICATE
+            tip_hash = self.get_latest_block().hash
+            status = self._attach(block)
+            if status in (ADDED, REORG, SIDE):
+                self._connect_orphans(block.hash)
+
+            tip_changed = self.get_latest_block().hash != tip_hash
+            if tip_changed:
+                # orphan vừa gắn có thể làm nhánh phụ vượt main chain
+                if status == SIDE:
+                    status = REORG
+                self.tree.prune(len(self.chain) - 1)
+
+        if tip_changed:
+            self._notify()
+            print(f"✅ Đã thêm block {block.index} từ peer vào chain ({status}).")
+        return status
+
+    def _attach(self, block):
+        """Gắn block (đã kiểm tra hash + PoW) vào tip, nhánh phụ hoặc orphan."""
+        tip = self.get_latest_block()
+        if block.previous_hash == tip.hash:
+            if not self.is_valid_new_block(block, tip):
+                return INVALID
+            self._append_block(block)
+            return ADDED
+
+        parent = self.get_block_by_hash(block.previous_hash)
+        if parent is not None:
+            parent_work = self._work_at(parent.index)
+        else:
+            side = self.tree.side(block.previous_hash)
+            if side is None:
+                self.tree.add_orphan(block)
+                return ORPHAN
+            parent, parent_work = side
 
-        self.chain.append(block)
-        self._notify()
-        print(f"✅ Đã thêm block {block.index} từ peer vào chain.")
-        return True
+        if block.index != parent.index + 1:
+            print("❌ Block từ peer có index không khớp, bỏ qua.")
+            return INVALID
+
+        work = parent_work + block_work(self.difficulty)
+        self.tree.add_side(block, work)
+        if work <= self._work_at(len(self.chain) - 1):
+            return SIDE
+
+        branch = self.tree.branch(block.hash)
+        fork_parent = self.get_block(branch[0].index - 1)
+        if fork_parent is None or fork_parent.hash != branch[0].previous_hash:
+            # tổ tiên nhánh phụ đã bị prune -> nhánh bị cụt, không ghép vào chain được;
+            # bỏ nhánh, caller coi như orphan và sync lại
+            for side_block in branch:
+                self.tree.remove_side(side_block.hash)
+            return ORPHAN
+        print(f"🔀 Đổi nhánh tại height {branch[0].index}, sâu {len(self.chain) - branch[0].index} block")
+        self._switch_branch(branch[0].index, branch)
+        return REORG
+
+    def _connect_orphans(self, parent_hash):
+        """Gắn các orphan đang chờ parent_hash (và con cháu). True nếu có block được gắn."""
+        attached = False
+        pending = [parent_hash]
+        while pending:
+            for orphan in self.tree.pop_orphans(pending.pop()):
+                if self._attach(orphan) in (ADDED, REORG, SIDE):
+                    attached = True
+                    pending.append(orphan.hash)
+        return attached
 
     # ---------- VALIDATION ----------
     def is_valid_new_block(self, new_block: Block, previous_block: Block):
@@ -126,24 +390,24 @@ class Blockchain:
         return True
 
     def is_chain_valid(self):
-        for i in range(1, len(self.chain)):
-            current = self.chain[i]
-            previous = self.chain[i - 1]
-
-            if not self.is_valid_new_block(current, previous):
-                print(f"❌ Blockchain không hợp lệ tại block {i}")
-                return False
+        chain = self.snapshot()
+        # tự kiểm tra: hash lại toàn bộ, không dùng cache block đã kiểm tra
+        if not self.validator.validate(chain[1:], self.difficulty, chain[0], use_cache=False):
+            print("❌ Blockchain không hợp lệ")
+            return False
 
         print("✅ Blockchain hợp lệ")
         return True
 
     # phụ: convert chain sang list dict để trả JSON
     def to_dict(self):
-        return [block.to_dict() for block in self.chain]
+        return [block.to_dict() for block in self.snapshot()]
     
     def _validate_external_chain(self, chain_list):
         """
         chain_list: list[Block] – chain đã được convert từ dict
+        Prefix trùng block đã kiểm tra (vd chain local) không bị hash lại;
+        các block đó được thay tại chỗ bằng object local.
         """
         if not chain_list:
             return False
@@ -152,56 +416,320 @@ class Blockchain:
         if chain_list[0].hash != self.chain[0].hash:
             print("Genesis block không khớp.")
             return False
+        chain_list[0] = self.get_block(0)
 
-        for i in range(1, len(chain_list)):
-            if not self.is_valid_new_block(chain_list[i], chain_list[i - 1]):
-                return False
-
-        return True
+        return self.validator.validate(chain_list, self.difficulty)
 
 
-    def sync_chain(self, peers, add_log):
+    def sync_chain(self, peers, add_log, report=None):
         """
         Lấy chain từ các peers, áp dụng quy tắc:
         - Chuỗi dài nhất, hợp lệ -> thay thế chain hiện tại.
+        Sync theo kiểu headers-first: tìm điểm rẽ nhánh bằng cách so hash
+        header, sau đó chỉ tải các block phía sau điểm đó.
+        Chỉ tải + validate ứng viên tốt nhất; hỏng thì mới chuyển sang ứng viên kế,
+        nên bộ nhớ đỉnh chỉ khoảng 1 chain.
+        report (dict, tuỳ chọn): ghi "ok" (peer trả lời /tip), "errors" (peer -> lỗi mạng /
+        chain không hợp lệ), "source" (peer cung cấp chain mới) cho SyncScheduler.
+        Peer chỉ đơn giản không có gì mới hơn (304, không dài hơn) không bị tính là lỗi.
         """
+        report = {} if report is None else report
+        report.setdefault("ok", [])
+        report.setdefault("errors", {})
         max_length = len(self.chain)
-        best_chain = None
 
-        for peer in peers:
-            try:
-                res = requests.get(f"{peer}/chain", timeout=3)
-                data = res.json()
+        # hỏi (length, hash tip) của mọi peer song song, peer chậm quá hạn bị bỏ qua
+        tips = self.gossip.map(peers, self._fetch_tip, timeout=SYNC_TIP_TIMEOUT)
+        for group in self._rank_candidates(tips, max_length, add_log, report):
+            # các peer trong group cùng tip hash -> cùng 1 chain, peer nhanh trước;
+            # lỗi mạng -> thử peer kế tiếp, chain không hợp lệ -> bỏ cả group
+            for peer, length in group:
+                try:
+                    candidate_chain = self._fetch_candidate(peer, length, max_length)
+                except InvalidChainError as e:
+                    add_log(f"Chain từ {peer} không hợp lệ: {e}")
+                    report["errors"][peer] = str(e)
+                    break
+                except Exception as e:
+                    add_log(f"Không thể sync chain từ {peer}: {e}")
+                    report["errors"][peer] = str(e)
+                    continue
 
-                length = data.get("length")
-                chain_data = data.get("chain")
+                # tải + validate không giữ lock; chỉ bước đổi tip mới cần
+                with self._lock:
+                    replaced = (candidate_chain is not None
+                                and len(candidate_chain) > len(self.chain))
+                    if replaced:
+                        self._replace_chain(candidate_chain)
+                if replaced:
+                    self._notify()
+                    report["source"] = peer
+                    return True
+                # peer không có gì mới hơn chain local (hoặc local đã bắt kịp lúc tải)
+                break
 
-                # dữ liệu không đầy đủ
-                if length is None or chain_data is None:
-                    continue
+        return False
 
-                if length > max_length:
-                    # convert dict -> Block
-                    candidate_chain = [Block.from_dict(b) for b in chain_data]
+    def _rank_candidates(self, tips, min_length, add_log, report):
+        """
+        Gom peer theo tip hash, xếp theo length giảm dần.
+        Trả về list group, mỗi group là list (peer, length) xếp theo latency.
+        Peer cũ (không có /tip) mỗi peer 1 group, để cuối.
+        """
+        groups = {}
+        legacy = []
+        for peer, tip in tips.items():
+            if isinstance(tip, Exception):
+                add_log(f"Không thể sync chain từ {peer}: {tip}")
+                report["errors"][peer] = str(tip)
+                continue
+            report["ok"].append(peer)
+            if tip is None or tip[0] is None:
+                legacy.append([(peer, None)])
+            elif tip[0] > min_length:
+                groups.setdefault(tip, []).append((peer, tip[0]))
+
+        def latency(item):
+            value = self.gossip.latency(item[0])
+            return value if value is not None else float("inf")
+
+        ranked = sorted(groups.items(), key=lambda item: item[0][0], reverse=True)
+        return [sorted(group, key=latency) for _, group in ranked] + legacy
+
+    def _fetch_tip(self, peer):
+        """(length, hash tip) của peer, None nếu peer chưa hỗ trợ /tip."""
+        res = self.gossip.get(peer, "/tip")
+        if res.status_code == 404:
+            return None
+        data = res.json()
+        self.gossip.set_wire(peer, data.get("wire", False))
+        return data.get("length"), data.get("hash")
 
-                    if self._validate_external_chain(candidate_chain):
-                        max_length = length
-                        best_chain = candidate_chain
+    def _fetch_candidate(self, peer, length, min_length):
+        """
+        Trả về chain ứng viên (prefix local + phần tải về) nếu peer có
+        chain hợp lệ dài hơn min_length, None nếu peer không có gì mới hơn.
+        Chain không hợp lệ -> InvalidChainError.
+        length: độ dài chain peer báo qua /tip (None -> tải cả /chain như cũ).
+        """
+        if length is None:
+            return self._fetch_full_chain(peer, min_length)
+        if length <= min_length:
+            return None
 
-            except Exception as e:
-                add_log(f"Không thể sync chain từ {peer}: {e}")
+        # cùng 1 snapshot cho cả quá trình tải, tip local có đổi giữa chừng cũng không lẫn
+        local = self.snapshot()
+        fork_height = self._find_fork_point(peer, length, local)
+        if fork_height is None:
+            raise InvalidChainError("không tìm được điểm chung")
 
-        if best_chain:
-            self.chain = best_chain
-            self._notify()
-            return True
+        suffix = self._fetch_blocks(peer, fork_height + 1, length, local[fork_height])
+        if suffix is None:
+            raise InvalidChainError("block tải về không hợp lệ")
 
-        return False
+        candidate_chain = local[:fork_height + 1] + suffix
+        if len(candidate_chain) <= min_length:
+            return None
+        return candidate_chain
+
+    def _accept_headers(self, peer):
+        """Xin định dạng wire nếu peer hỗ trợ, JSON làm dự phòng."""
+        if self.gossip.supports_wire(peer):
+            return {"Accept": f"{wire.CONTENT_TYPE}, application/json;q=0.5"}
+        return {}
 
+    @staticmethod
+    def _is_wire(res):
+        return res.headers.get("Content-Type", "").startswith(wire.CONTENT_TYPE)
+
+    def _fetch_full_chain(self, peer, min_length):
+        """
+        Tải toàn bộ /chain của peer. Gửi kèm ETag lần trước: 304 nghĩa là chain
+        của peer không đổi kể từ lần tải đó (đã xử lý xong) -> không có gì mới,
+        hoặc vẫn là chain không hợp lệ như lần trước.
+        """
+        headers = self._accept_headers(peer)
+        cached = self._chain_etags.get(peer)
+        if cached is not None:
+            headers["If-None-Match"] = cached[0]
+        res = self.gossip.get(peer, "/chain", headers=headers)
+        if res.status_code == 304:
+            if cached is not None and cached[1]:
+                raise InvalidChainError("chain không hợp lệ (không đổi từ lần tải trước)")
+            return None
+
+        # chỉ nhớ ETag khi đã xử lý xong phản hồi (lỗi giữa chừng -> lần sau tải lại)
+        etag = res.headers.get("ETag")
+        try:
+            candidate_chain = self._read_full_chain(res, min_length)
+        except InvalidChainError:
+            self._remember_etag(peer, etag, invalid=True)
+            raise
+        self._remember_etag(peer, etag, invalid=False)
+        return candidate_chain
+
+    def _remember_etag(self, peer, etag, invalid):
+        if etag:
+            self._chain_etags[peer] = (etag, invalid)
+        else:
+            self._chain_etags.pop(peer, None)
+
+    def _read_full_chain(self, res, min_length):
+        if self._is_wire(res):
+            length, _, candidate_chain = wire.decode_blocks(res.content)
+            if length <= min_length:
+                return None
+            if self._validate_external_chain(candidate_chain):
+                return candidate_chain
+            raise InvalidChainError("chain không hợp lệ")
+
+        data = res.json()
+
+        length = data.get("length")
+        chain_data = data.get("chain")
+
+        # dữ liệu không đầy đủ
+        if length is None or chain_data is None or length <= min_length:
+            return None
+
+        # convert dict -> Block
+        candidate_chain = [Block.from_dict(b) for b in chain_data]
+        if self._validate_external_chain(candidate_chain):
+            return candidate_chain
+        raise InvalidChainError("chain không hợp lệ")
+
+    def _iter_range(self, peer, path, key, start, end):
+        """Gọi /headers hoặc /blocks/range theo từng batch, yield list dict."""
+        while start < end:
+            res = self.gossip.get(peer, f"/{path}", params={"from": start, "to": end})
+            batch = res.json().get(key) or []
+            if not batch:
+                return
+            yield batch
+            start += len(batch)
+
+    def _find_fork_point(self, peer, peer_length, local):
+        """
+        Height cao nhất mà hash của peer trùng hash trong snapshot `local`.
+        Lùi dần từ tip với cửa sổ tăng gấp đôi -> O(độ sâu fork).
+        """
+        top = min(len(local), peer_length) - 1
+        window = SYNC_FORK_WINDOW
+        while top >= 0:
+            low = max(0, top - window + 1)
+            headers = []
+            for batch in self._iter_range(peer, "headers", "headers", low, top + 1):
+                headers.extend(batch)
+            if len(headers) != top + 1 - low:
+                return None
+
+            for height in range(top, low - 1, -1):
+                if headers[height - low]["hash"] == local[height].hash:
+                    return height
+
+            top = low - 1
+            window *= 2
+        return None
+
+    def _iter_block_range(self, peer, start, end):
+        """Như _iter_range cho /blocks/range nhưng yield list Block (wire hoặc JSON)."""
+        headers = self._accept_headers(peer)
+        while start < end:
+            res = self.gossip.get(peer, "/blocks/range", params={"from": start, "to": end},
+                                  headers=headers)
+            if self._is_wire(res):
+                batch = wire.decode_blocks(res.content)[2]
+            else:
+                batch = [Block.from_dict(data) for data in res.json().get("blocks") or []]
+            if not batch:
+                return
+            yield batch
+            start += len(batch)
+
+    def _fetch_blocks(self, peer, start, end, previous_block):
+        """Tải block [start, end) và validate nối tiếp ngay khi nhận từng batch."""
+        blocks = []
+        for batch in self._iter_block_range(peer, start, end):
+            if not self.validator.validate(batch, self.difficulty, previous_block):
+                return None
+            blocks.extend(batch)
+            previous_block = batch[-1]
+        return blocks
+
+    # Reader không lấy self._lock: chain đọc qua snapshot, index đổi từng key atomic.
     def get_balance(self, address):
+        balance = self.balance_index.balance(address)
+        if self.verify_balance_index:
+            scanned = self._scan_balance(address)
+            if scanned != balance:
+                print(f"❌ Balance index lệch với quét chain cho {address}: {balance} != {scanned}")
+                return scanned
+        return balance
+
+    # ---------- TRA CỨU (chain_index) ----------
+    def get_block(self, height):
+        chain = self.snapshot()
+        if 0 <= height < len(chain):
+            return chain[height]
+        return None
+
+    def get_block_by_hash(self, block_hash):
+        height = self.chain_index.height_of(block_hash)
+        if height is None:
+            return None
+        block = self.get_block(height)
+        return block if block is not None and block.hash == block_hash else None
+
+    def find_transaction(self, tx_id):
+        """List (block, position) chứa tx_id, cũ trước."""
+        # snapshot lấy sau index (chain publish trước index) -> đủ block;
+        # đổi nhánh xen giữa -> so lại tx_id tại vị trí
+        locations = self.chain_index.locate_tx(tx_id)
+        chain = self.snapshot()
+        return [(chain[height], position) for height, position in locations
+                if self._tx_at(chain, height, position, lambda tx: tx_id_of(tx) == tx_id)]
+
+    def get_address_history(self, address, offset=0, limit=50):
+        """(tổng số tx của address, list (block, position) mới nhất trước)."""
+        total, locations = self.chain_index.history(address, offset, limit)
+        chain = self.snapshot()
+        return total, [(chain[height], position) for height, position in locations
+                       if self._tx_at(chain, height, position,
+                                      lambda tx: address in tx_addresses(tx))]
+
+    @staticmethod
+    def _tx_at(chain, height, position, match):
+        return (height < len(chain) and position < len(chain[height].transactions)
+                and match(chain[height].transactions[position]))
+
+    def get_tx_count(self, address):
+        return self.balance_index.tx_count(address)
+
+    def check_balance_index(self):
+        """
+        So sánh toàn bộ index với kết quả quét chain.
+        Trả về list (address, index_balance, scanned_balance) bị lệch.
+        """
+        mismatches = []
+        with self._lock:
+            for address in self.balance_index.addresses():
+                indexed = self._safe_balance(self.balance_index.balance, address)
+                scanned = self._safe_balance(self._scan_balance, address)
+                if indexed != scanned:
+                    mismatches.append((address, indexed, scanned))
+        return mismatches
+
+    @staticmethod
+    def _safe_balance(fn, address):
+        try:
+            return fn(address)
+        except ValueError as e:
+            return f"error: {e}"
+
+    def _scan_balance(self, address):
         balance = 0
 
-        for block in self.chain:
+        for block in self.snapshot():
             for tx in block.transactions:
                 # tiền nhận
                 if tx.get("to") == address:
@@ -0,0 +1,94 @@
+# block_tree.py
+from collections import OrderedDict
+
+# kết quả Blockchain.add_block_from_peer
+ADDED = "added"          # nối vào tip
+REORG = "reorg"          # nhánh phụ vượt work của main chain -> đổi tip
+SIDE = "side"            # hợp lệ, nằm trên nhánh phụ
+ORPHAN = "orphan"        # chưa có parent, chờ parent / sync
+DUPLICATE = "duplicate"  # đã biết
+INVALID = "invalid"
+
+# số orphan giữ tối đa (cũ nhất bị bỏ trước)
+MAX_ORPHANS = 500
+# nhánh phụ sâu hơn số block này dưới tip thì bỏ
+MAX_SIDE_DEPTH = 100
+
+
+def block_work(difficulty):
+    """Work của 1 block: số hash kỳ vọng để có `difficulty` chữ số hex 0 ở đầu."""
+    return 16 ** difficulty
+
+
+class BlockTree:
+    """
+    Phần cây block nằm ngoài main chain, index theo hash:
+    - side: block hợp lệ trên nhánh phụ, kèm cumulative work
+    - orphan: block chưa biết parent, index thêm theo previous_hash
+    Main chain vẫn là Blockchain.chain; cây chỉ giữ phần rẽ nhánh nên đổi tip
+    chỉ tốn O(độ sâu fork).
+    """
+
+    def __init__(self, max_orphans=MAX_ORPHANS, max_side_depth=MAX_SIDE_DEPTH):
+        self.max_orphans = max_orphans
+        self.max_side_depth = max_side_depth
+        self._side = {}                 # hash -> (block, cumulative work)
+        self._orphans = OrderedDict()   # hash -> block
+        self._waiting = {}              # previous_hash -> set hash orphan
+
+    def __contains__(self, block_hash):
+        return block_hash in self._side or block_hash in self._orphans
+
+    # ---------- NHÁNH PHỤ ----------
+    def side(self, block_hash):
+        """(block, cumulative work) nếu block nằm trên nhánh phụ, ngược lại None."""
+        return self._side.get(block_hash)
+
+    def add_side(self, block, work):
+        self._side[block.hash] = (block, work)
+
+    def remove_side(self, block_hash):
+        self._side.pop(block_hash, None)
+
+    def branch(self, tip_hash):
+        """Các block nhánh phụ từ sau điểm rẽ tới tip_hash (cũ trước)."""
+        blocks = []
+        entry = self._side.get(tip_hash)
+        while entry is not None:
+            blocks.append(entry[0])
+            entry = self._side.get(entry[0].previous_hash)
+        blocks.reverse()
+        return blocks
+
+    def prune(self, tip_height):
+        """Bỏ block nhánh phụ / orphan quá sâu dưới tip."""
+        min_height = tip_height - self.max_side_depth
+        for block_hash in [h for h, (b, _) in self._side.items() if b.index < min_height]:
+            del self._side[block_hash]
+        for block_hash in [h for h, b in self._orphans.items() if b.index < min_height]:
+            self._drop_orphan(block_hash)
+
+    # ---------- ORPHAN ----------
+    def add_orphan(self, block):
+        if block.hash in self._orphans:
+            return
+        self._orphans[block.hash] = block
+        self._waiting.setdefault(block.previous_hash, set()).add(block.hash)
+        while len(self._orphans) > self.max_orphans:
+            self._drop_orphan(next(iter(self._orphans)))
+
+    def pop_orphans(self, parent_hash):
+        """Lấy (và xoá) các orphan đang chờ parent_hash."""
+        children = self._waiting.pop(parent_hash, ())
+        return [self._orphans.pop(block_hash) for block_hash in children]
+
+    def _drop_orphan(self, block_hash):
+        block = self._orphans.pop(block_hash)
+        waiting = self._waiting.get(block.previous_hash)
+        if waiting is not None:
+            waiting.discard(block_hash)
+            if not waiting:
+                del self._waiting[block.previous_hash]
+
+    def stats(self):
+        return {"side": len(self._side), "orphans": len(self._orphans)}
@@ -0,0 +1,63 @@
+# chain_cache.py
+import json
+import threading
+
+# số block ghép chung vào 1 chunk khi stream /chain
+STREAM_BATCH = 64
+
+
+class ChainJsonCache:
+    """
+    Cache bản encode (mặc định JSON) của từng block cho /chain.
+    - block mới ở tip: chỉ encode thêm block đó
+    - reorg: cắt cache từ điểm rẽ nhánh rồi encode lại phần sau
+    Được làm mới lười lúc có request (so hash với chain hiện tại),
+    nên không phụ thuộc vào việc mọi chỗ đổi chain đều gọi _notify.
+    """
+
+    def __init__(self, blockchain, encode=None):
+        """encode: hàm block -> bytes, mặc định JSON compact (vd wire.encode_block)."""
+        self.blockchain = blockchain
+        self._encode = encode or self._encode_json
+        self._lock = threading.Lock()
+        self._hashes = []
+        self._encoded = []
+
+    @staticmethod
+    def _encode_json(block):
+        return json.dumps(block.to_dict(), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+    def _refresh(self, chain):
+        cached = len(self._hashes)
+        # nhanh: tip cache vẫn nằm trên chain -> chỉ cần nối thêm
+        if cached and cached <= len(chain) and chain[cached - 1].hash == self._hashes[-1]:
+            height = cached
+        else:
+            height = 0
+            limit = min(cached, len(chain))
+            while height < limit and self._hashes[height] == chain[height].hash:
+                height += 1
+            del self._hashes[height:]
+            del self._encoded[height:]
+
+        for block in chain[height:]:
+            self._hashes.append(block.hash)
+            self._encoded.append(self._encode(block))
+
+    def snapshot(self):
+        """(etag, list bytes đã encode của từng block) của chain tại thời điểm gọi."""
+        chain = self.blockchain.snapshot()
+        with self._lock:
+            self._refresh(chain)
+            encoded = self._encoded[:len(chain)]
+        etag = f"{len(chain)}-{chain[-1].hash}"
+        return etag, encoded
+
+    @staticmethod
+    def stream(encoded):
+        """Sinh body {"length": N, "chain": [...]} theo từng chunk."""
+        yield b'{"length":%d,"chain":[' % len(encoded)
+        for start in range(0, len(encoded), STREAM_BATCH):
+            chunk = b",".join(encoded[start:start + STREAM_BATCH])
+            yield chunk if start == 0 else b"," + chunk
+        yield b"]}"
@@ -0,0 +1,121 @@
+# chain_index.py
+import bisect
+from collections.abc import Mapping
+
+from merkle import tx_hash
+
+
+def tx_id_of(tx):
+    """tx_id của tx trong block: field "tx_id" (miner gắn từ gossip) hoặc hash lá merkle."""
+    if isinstance(tx, Mapping):
+        tx_id = tx.get("tx_id")
+        if isinstance(tx_id, str) and tx_id:
+            return tx_id
+    return tx_hash(tx)
+
+
+def tx_addresses(tx):
+    """Các address (str) mà tx đụng tới, không lặp."""
+    if not isinstance(tx, Mapping):
+        return ()
+    sender, receiver = tx.get("from"), tx.get("to")
+    addresses = [a for a in (sender, receiver) if isinstance(a, str)]
+    if len(addresses) == 2 and sender == receiver:
+        addresses.pop()
+    return addresses
+
+
+class ChainIndex:
+    """
+    Index tra cứu lịch sử, cập nhật theo từng block:
+    - block hash -> height
+    - tx_id -> list (height, position) (tx_id có thể lặp, vd tx thưởng giống hệt nhau)
+    - address -> list (height, position), theo thứ tự chain
+    Reader không cần lock: mỗi key chỉ đổi bằng 1 thao tác atomic (append,
+    gán slice, gán dict), rebuild dựng dict mới rồi thay.
+    """
+
+    def __init__(self):
+        self._heights = {}
+        self._txs = {}
+        self._history = {}
+
+    def clear(self):
+        self._heights, self._txs, self._history = {}, {}, {}
+
+    @staticmethod
+    def _entries(blocks):
+        """Yield (index, key, location) cho mọi tx của blocks, theo thứ tự chain."""
+        for block in blocks:
+            for position, tx in enumerate(block.transactions):
+                location = (block.index, position)
+                yield "tx", tx_id_of(tx), location
+                for address in tx_addresses(tx):
+                    yield "address", address, location
+
+    def _index(self, name):
+        return self._txs if name == "tx" else self._history
+
+    def apply_block(self, block):
+        self._heights[block.hash] = block.index
+        for name, key, location in self._entries([block]):
+            index = self._index(name)
+            locations = index.get(key)
+            if locations is None:
+                index[key] = [location]
+            else:
+                locations.append(location)
+
+    def switch_branch(self, fork_height, rolled, branch):
+        """
+        Thay các block `rolled` (từ fork_height tới tip) bằng `branch`.
+        Phần đuôi mới của mỗi key được tính trước, rồi gán 1 lần: lst[cắt:] = đuôi mới.
+        """
+        tails = {}
+        for name, key, _ in self._entries(rolled):
+            tails.setdefault((name, key), [])
+        for name, key, location in self._entries(branch):
+            tails.setdefault((name, key), []).append(location)
+
+        for block in branch:
+            self._heights[block.hash] = block.index
+        for (name, key), tail in tails.items():
+            index = self._index(name)
+            locations = index.get(key)
+            if locations is None:
+                if tail:
+                    index[key] = tail
+                continue
+            locations[bisect.bisect_left(locations, (fork_height, -1)):] = tail
+            if not locations:
+                del index[key]
+        branch_hashes = {block.hash for block in branch}
+        for block in rolled:
+            if block.hash not in branch_hashes:
+                self._heights.pop(block.hash, None)
+
+    def rebuild(self, chain):
+        fresh = ChainIndex()
+        for block in chain:
+            fresh.apply_block(block)
+        self._heights, self._txs, self._history = fresh._heights, fresh._txs, fresh._history
+
+    # ---------- TRA CỨU ----------
+    def height_of(self, block_hash):
+        return self._heights.get(block_hash)
+
+    def locate_tx(self, tx_id):
+        """List (height, position) của tx_id, cũ trước."""
+        return list(self._txs.get(tx_id, ()))
+
+    def locations(self, address):
+        """Mọi (height, position) của address theo thứ tự chain."""
+        return list(self._history.get(address, ()))
+
+    def history(self, address, offset=0, limit=50):
+        """(tổng số, list (height, position) mới nhất trước, bỏ qua `offset`)."""
+        locations = self._history.get(address, ())
+        total = len(locations)
+        end = max(0, total - offset)
+        start = max(0, end - limit)
+        return total, locations[start:end][::-1]
@@ -0,0 +1,201 @@
+# chain_store.py
+import json
+import mmap
+import os
+import struct
+import zlib
+
+from block import Block
+
+# record trong segment: [length u32][crc32 u32][json bytes]
+RECORD_HEADER = struct.Struct("<II")
+# entry trong index: [segment u32][offset u64][length u32], entry thứ i = height i
+INDEX_ENTRY = struct.Struct("<IQI")
+
+INDEX_FILE = "index.dat"
+SEGMENT_PREFIX = "segment_"
+SEGMENT_SUFFIX = ".dat"
+
+
+class ChainStore:
+    """
+    Lưu chain xuống đĩa dạng log append-only chia segment
+    + một file index nhỏ (height -> segment/offset).
+    """
+
+    def __init__(self, directory, segment_size=64 * 1024 * 1024, tail_check=16, fsync=False):
+        self.directory = directory
+        self.segment_size = segment_size
+        # số block cuối được kiểm tra crc khi load
+        self.tail_check = tail_check
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+
+        self._entries = []  # list[(segment, offset, length)]
+        self._read_index()
+
+    # ---------- FILE HELPERS ----------
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f"{SEGMENT_PREFIX}{segment:05d}{SEGMENT_SUFFIX}")
+
+    def _index_path(self):
+        return os.path.join(self.directory, INDEX_FILE)
+
+    def _segments_on_disk(self):
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                segments.append(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]))
+        return sorted(segments)
+
+    def _flush(self, f):
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    def _read_index(self):
+        path = self._index_path()
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as f:
+            data = f.read()
+        # bỏ entry ghi dở (crash giữa chừng)
+        usable = len(data) - len(data) % INDEX_ENTRY.size
+        if usable != len(data):
+            with open(path, "r+b") as f:
+                f.truncate(usable)
+        self._entries = [entry for entry in INDEX_ENTRY.iter_unpack(data[:usable])]
+
+    def __len__(self):
+        return len(self._entries)
+
+    # ---------- LOAD ----------
+    def load(self):
+        """
+        Đọc toàn bộ block qua mmap. Chỉ `tail_check` block cuối được kiểm tra đầy đủ
+        (crc, kiểu field, merkle root tính lại); phần trước đó đã được validate khi ghi
+        nên dựng thẳng từ dữ liệu đã lưu. Gặp record hỏng ở đuôi thì cắt store tại đó.
+        Trả về list[Block].
+        """
+        blocks = []
+        maps = {}
+        tail_start = max(0, len(self._entries) - self.tail_check)
+        try:
+            for height, (segment, offset, length) in enumerate(self._entries):
+                view = maps.get(segment)
+                if view is None:
+                    view = self._map_segment(segment)
+                    maps[segment] = view
+
+                verify = height >= tail_start
+                record = self._read_record(view, offset, length, verify=verify)
+                if record is None:
+                    print(f"❌ Chain store hỏng tại height {height}, cắt bỏ phần đuôi")
+                    break
+                try:
+                    data = json.loads(record)
+                    blocks.append(Block.from_dict(data) if verify else Block.from_trusted_dict(data))
+                except (AttributeError, KeyError, TypeError, ValueError) as e:
+                    # record cũ hỏng (crc chưa kiểm tra) cũng cắt như đuôi, không làm node không khởi động được
+                    print(f"❌ Block trong store không hợp lệ tại height {height} ({e}), cắt bỏ phần đuôi")
+                    break
+        finally:
+            for view in maps.values():
+                if view is not None:
+                    view.close()
+
+        if len(blocks) != len(self._entries):
+            self.truncate(len(blocks))
+        else:
+            self._trim_unindexed()
+        return blocks
+
+    def _map_segment(self, segment):
+        path = self._segment_path(segment)
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return None
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @staticmethod
+    def _read_record(view, offset, length, verify):
+        if view is None or offset + length > len(view) or length < RECORD_HEADER.size:
+            return None
+        size, crc = RECORD_HEADER.unpack_from(view, offset)
+        if size != length - RECORD_HEADER.size:
+            return None
+        start = offset + RECORD_HEADER.size
+        payload = view[start:start + size]
+        if verify and zlib.crc32(payload) != crc:
+            return None
+        return payload
+
+    def _trim_unindexed(self):
+        # bytes ghi vào segment nhưng chưa kịp vào index -> bỏ
+        if self._entries:
+            segment, offset, length = self._entries[-1]
+            path = self._segment_path(segment)
+            if os.path.getsize(path) > offset + length:
+                with open(path, "r+b") as f:
+                    f.truncate(offset + length)
+        else:
+            segment = -1
+        for later in self._segments_on_disk():
+            if later > segment:
+                os.remove(self._segment_path(later))
+
+    # ---------- WRITE ----------
+    def append(self, block):
+        payload = json.dumps(block.to_dict(), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        record = RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+        if self._entries:
+            segment, offset, length = self._entries[-1]
+            offset += length
+            if offset + len(record) > self.segment_size:
+                segment, offset = segment + 1, 0
+        else:
+            segment, offset = 0, 0
+
+        with open(self._segment_path(segment), "ab") as f:
+            if f.tell() != offset:
+                f.truncate(offset)
+                f.seek(offset)
+            f.write(record)
+            self._flush(f)
+
+        entry = (segment, offset, len(record))
+        with open(self._index_path(), "ab") as f:
+            f.write(INDEX_ENTRY.pack(*entry))
+            self._flush(f)
+        self._entries.append(entry)
+
+    def truncate(self, height):
+        """Giữ lại block [0, height), xoá phần còn lại."""
+        if height >= len(self._entries):
+            return
+        with open(self._index_path(), "r+b") as f:
+            f.truncate(height * INDEX_ENTRY.size)
+            self._flush(f)
+
+        if height > 0:
+            segment, offset, length = self._entries[height - 1]
+            keep_segment, keep_bytes = segment, offset + length
+        else:
+            keep_segment, keep_bytes = 0, 0
+
+        for segment in self._segments_on_disk():
+            path = self._segment_path(segment)
+            if segment > keep_segment:
+                os.remove(path)
+            elif segment == keep_segment:
+                with open(path, "r+b") as f:
+                    f.truncate(keep_bytes)
+
+        del self._entries[height:]
+
+    def replace_from(self, height, blocks):
+        """Cắt store tại `height` rồi ghi tiếp `blocks` (dùng khi đổi nhánh)."""
+        self.truncate(height)
+        for block in blocks:
+            self.append(block)
@@ -0,0 +1,154 @@
+# chain_validator.py
+import os
+import threading
+from collections import OrderedDict
+
+from block import Block
+from parallel_miner import pool_context
+
+# số block mỗi chunk gửi cho 1 worker
+VALIDATE_CHUNK = 512
+# ít hơn số block cần hash này thì kiểm tra ngay trong process hiện tại
+PARALLEL_THRESHOLD = 2048
+# số hash block đã kiểm tra được nhớ lại
+VERIFIED_CAPACITY = 200_000
+
+
+def _job(block):
+    """Dữ liệu gửi cho worker: chỉ header với block v2, cả block với v1."""
+    if block.version >= Block.MERKLE_VERSION:
+        return block.header_fields(), block.hash
+    return block, block.hash
+
+
+def _check_chunk(jobs, difficulty):
+    """
+    Chạy trong process con (hoặc tại chỗ): kiểm tra hash + PoW của 1 chunk.
+    Trả về (vị trí lỗi đầu tiên trong chunk, lý do) hoặc None.
+    """
+    target_prefix = "0" * difficulty
+    for offset, (data, block_hash) in enumerate(jobs):
+        if isinstance(data, tuple):
+            recalculated = Block.hash_header(*data)
+        else:
+            recalculated = data.calculate_hash()
+        if block_hash != recalculated:
+            return offset, "❌ Hash không khớp calculate_hash()"
+        if not block_hash.startswith(target_prefix):
+            return offset, "❌ PoW không hợp lệ (hash không đủ số 0 ở đầu)"
+    return None
+
+
+class ChainValidator:
+    """
+    Kiểm tra 1 đoạn chain:
+    - liên kết index / previous_hash kiểm tra tuần tự (rẻ)
+    - hash + PoW chia chunk cho process pool khi đoạn đủ dài
+    - nhớ hash các block đã kiểm tra (LRU); block ứng viên trùng hash
+      được thay bằng chính object Block đã kiểm tra, nên không cần hash lại
+      mà vẫn không tin nội dung peer gửi.
+    """
+
+    def __init__(self, workers=1, chunk_size=VALIDATE_CHUNK, capacity=VERIFIED_CAPACITY):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.capacity = capacity
+        self._verified = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def remember(self, blocks):
+        """Đánh dấu các block (đã được kiểm tra ở chỗ khác) là hợp lệ."""
+        with self._lock:
+            for block in blocks:
+                self._verified[block.hash] = block
+                self._verified.move_to_end(block.hash)
+            while len(self._verified) > self.capacity:
+                self._verified.popitem(last=False)
+
+    def _lookup(self, block):
+        with self._lock:
+            known = self._verified.get(block.hash)
+            if known is not None:
+                self._verified.move_to_end(block.hash)
+        if known is not None and known.index == block.index:
+            return known
+        return None
+
+    def check_block(self, block, difficulty):
+        """Hash + PoW của 1 block, không cần biết parent."""
+        failure = _check_chunk([_job(block)], difficulty)
+        if failure is not None:
+            print(f"{failure[1]} tại block {block.index}")
+            return False
+        return True
+
+    def validate(self, blocks, difficulty, previous_block=None, use_cache=True):
+        """
+        Kiểm tra blocks[i] nối tiếp blocks[i-1] (blocks[0] nối tiếp previous_block nếu có).
+        Block đã biết được thay tại chỗ trong `blocks`. Trả về True/False.
+        """
+        pending = []
+        previous = previous_block
+        for i, block in enumerate(blocks):
+            known = self._lookup(block) if use_cache else None
+            if known is not None:
+                blocks[i] = block = known
+
+            if previous is not None:
+                if block.index != previous.index + 1:
+                    print(f"❌ Sai index tại block {block.index}")
+                    return False
+                if block.previous_hash != previous.hash:
+                    print(f"❌ previous_hash không khớp tại block {block.index}")
+                    return False
+            if known is None:
+                pending.append(block)
+            previous = block
+
+        if not self._verify(pending, difficulty):
+            return False
+        self.remember(pending)
+        return True
+
+    def _verify(self, blocks, difficulty):
+        jobs = [_job(block) for block in blocks]
+        chunks = [jobs[i:i + self.chunk_size] for i in range(0, len(jobs), self.chunk_size)]
+
+        if self.workers > 1 and len(jobs) >= PARALLEL_THRESHOLD:
+            results = self._ensure_pool().imap(_ChunkCheck(difficulty), chunks)
+        else:
+            results = (_check_chunk(chunk, difficulty) for chunk in chunks)
+
+        for chunk_no, failure in enumerate(results):
+            if failure is not None:
+                offset, reason = failure
+                print(f"{reason} tại block {blocks[chunk_no * self.chunk_size + offset].index}")
+                return False
+        return True
+
+    def start(self):
+        """Tạo pool ngay nếu có nhiều worker (gọi trước khi node chạy thread khác)."""
+        if self.workers > 1:
+            self._ensure_pool()
+
+    def _ensure_pool(self):
+        if self._pool is None:
+            self._pool = pool_context().Pool(processes=self.workers)
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+
+class _ChunkCheck:
+    """Hàm pickle được cho Pool.imap (difficulty cố định)."""
+
+    def __init__(self, difficulty):
+        self.difficulty = difficulty
+
+    def __call__(self, jobs):
+        return _check_chunk(jobs, self.difficulty)
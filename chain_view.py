@@ -0,0 +1,42 @@
+# chain_view.py
+from collections.abc import Sequence
+from itertools import islice
+
+
+class ChainView(Sequence):
+    """
+    Snapshot chỉ-đọc của main chain: `length` block đầu của list `blocks`.
+    Blockchain chỉ append vào cuối list (ngoài phạm vi snapshot cũ), còn đổi nhánh
+    thì tạo list mới, nên phần snapshot nhìn thấy không bao giờ đổi:
+    reader lấy view không cần lock và không chặn writer.
+    """
+    __slots__ = ("_blocks", "_length")
+
+    def __init__(self, blocks, length=None):
+        self._blocks = blocks
+        self._length = len(blocks) if length is None else length
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self._length)
+            if step == 1:
+                return self._blocks[start:stop]
+            return [self._blocks[i] for i in range(start, stop, step)]
+        if key < 0:
+            key += self._length
+        if not 0 <= key < self._length:
+            raise IndexError("chain index out of range")
+        return self._blocks[key]
+
+    def __iter__(self):
+        return islice(self._blocks, self._length)
+
+    def __reversed__(self):
+        for i in range(self._length - 1, -1, -1):
+            yield self._blocks[i]
+
+    def __repr__(self):
+        return f"ChainView(length={self._length})"
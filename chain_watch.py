@@ -0,0 +1,56 @@
+# chain_watch.py
+import threading
+import time
+
+
+class ChainWatch:
+    """
+    Kênh long-poll cho wallet: chờ tới khi balance của address hoặc tip
+    thay đổi so với trạng thái client đang biết.
+    Được đánh thức qua hook Blockchain.subscribe/_notify.
+    """
+
+    def __init__(self, blockchain):
+        self.blockchain = blockchain
+        self._cond = threading.Condition()
+        self._version = 0
+        blockchain.subscribe(self._on_chain_changed)
+
+    def _on_chain_changed(self):
+        with self._cond:
+            self._version += 1
+            self._cond.notify_all()
+
+    def snapshot(self, address):
+        chain = self.blockchain.snapshot()
+        return {
+            "address": address,
+            "balance": self.blockchain.get_balance(address),
+            "tx_count": self.blockchain.get_tx_count(address),
+            "tip": chain[-1].hash,
+            "length": len(chain),
+        }
+
+    def wait(self, address, known_balance=None, known_tip=None, timeout=25):
+        """
+        Trả về snapshot ngay nếu khác (known_balance, known_tip),
+        ngược lại chờ tới lần đổi chain kế tiếp hoặc hết timeout.
+        snapshot["changed"] cho biết có thay đổi hay không.
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            version = self._version
+        while True:
+            state = self.snapshot(address)
+            if state["balance"] != known_balance or state["tip"] != known_tip:
+                state["changed"] = True
+                return state
+
+            with self._cond:
+                while self._version == version:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        state["changed"] = False
+                        return state
+                    self._cond.wait(remaining)
+                version = self._version
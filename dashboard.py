@@ -0,0 +1,93 @@
+# dashboard.py
+"""
+Dashboard chạy riêng, gắn vào một node đang chạy (kể cả node --headless).
+Chain được mirror bằng headers-first sync qua HTTP, peers và log được poll.
+
+    python dashboard.py --node http://localhost:5001
+"""
+import argparse
+import os
+import threading
+import tkinter as tk
+
+from dotenv import load_dotenv
+
+from MainView import NodeGUI
+from ObservablePeers import ObservablePeers
+from blockChain import Blockchain
+from gossip import GossipDispatcher
+
+
+class RemoteNode:
+    """Bản sao chỉ-đọc của node từ xa, cập nhật trên thread nền."""
+
+    def __init__(self, node_url, interval=1.0):
+        self.node_url = node_url.rstrip("/")
+        self.interval = interval
+        self.gossip = GossipDispatcher(max_workers=2)
+
+        info = self.gossip.get(self.node_url, "/").json()
+        self.wallet_address = info.get("wallet_address")
+        # mirror chain: Blockchain thường, không store/mempool, chỉ sync từ 1 node
+        self.blockchain = Blockchain(difficulty=info.get("difficulty", 3), gossip=self.gossip)
+        self.peers = ObservablePeers()
+
+        self._log_seq = 0
+        self._stop = threading.Event()
+        self.add_log = print
+
+    def start(self, add_log):
+        self.add_log = add_log
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.blockchain.sync_chain([self.node_url], self.add_log)
+                self._sync_peers()
+                self._sync_logs()
+            except Exception as e:
+                self.add_log(f"Không kết nối được node {self.node_url}: {e}")
+            self._stop.wait(self.interval)
+
+    def _sync_peers(self):
+        remote = set(self.gossip.get(self.node_url, "/peers").json().get("peers", []))
+        for peer in list(self.peers):
+            if peer not in remote:
+                self.peers.discard(peer)
+        self.peers.update(remote)
+
+    def _sync_logs(self):
+        res = self.gossip.get(self.node_url, "/logs", params={"since": self._log_seq})
+        if res.status_code == 404:
+            return
+        data = res.json()
+        for entry in data.get("logs", []):
+            self._log_seq = max(self._log_seq, entry["seq"])
+            self.add_log(f"[node] {entry['msg']}")
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Dashboard cho node blockchain đang chạy")
+    parser.add_argument("--node", default=os.getenv("MY_ADDRESS") or os.getenv("INDEX_ADDRESS"),
+                        help="URL của node, vd http://localhost:5001")
+    parser.add_argument("--interval", type=float, default=1.0, help="chu kỳ cập nhật (giây)")
+    args = parser.parse_args()
+
+    remote = RemoteNode(args.node, interval=args.interval)
+
+    root = tk.Tk()
+    gui = NodeGUI(root, remote.blockchain, remote.peers, remote.node_url,
+                  wallet_address=remote.wallet_address or "")
+    remote.start(gui.add_log)
+
+    root.mainloop()
+    remote.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+# gossip.py
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from wire import CONTENT_TYPE as WIRE_CONTENT_TYPE
+
+
+class PeerStats:
+    def __init__(self):
+        self.requests = 0
+        self.failures = 0
+        self.total_latency = 0.0
+        self.last_latency = None
+        self.last_error = None
+        self.bytes_received = 0
+        # peer báo hỗ trợ định dạng wire nhị phân (qua /tip)
+        self.wire = False
+
+    @property
+    def avg_latency(self):
+        ok = self.requests - self.failures
+        return self.total_latency / ok if ok > 0 else None
+
+    def to_dict(self):
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "avg_latency": self.avg_latency,
+            "last_latency": self.last_latency,
+            "last_error": self.last_error,
+            "bytes_received": self.bytes_received,
+            "wire": self.wire,
+        }
+
+
+class GossipDispatcher:
+    """
+    Gửi HTTP tới các peer:
+    - mỗi peer một requests.Session (keep-alive, pool kết nối riêng)
+    - fan-out song song bằng thread pool, broadcast kiểu fire-and-forget
+    - timeout riêng cho từng peer, đếm latency / lỗi theo peer
+    """
+
+    def __init__(self, max_workers=16, timeout=3, pool_size=4):
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.peer_timeouts = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gossip")
+        self._sessions = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _session(self, peer):
+        with self._lock:
+            session = self._sessions.get(peer)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._sessions[peer] = session
+                self._stats.setdefault(peer, PeerStats())
+            return session
+
+    def set_timeout(self, peer, timeout):
+        self.peer_timeouts[peer] = timeout
+
+    def set_wire(self, peer, enabled):
+        with self._lock:
+            self._stats.setdefault(peer, PeerStats()).wire = bool(enabled)
+
+    def supports_wire(self, peer):
+        with self._lock:
+            stats = self._stats.get(peer)
+            return stats is not None and stats.wire
+
+    # ---------- BLOCKING ----------
+    def request(self, method, peer, path, timeout=None, **kwargs):
+        """Gửi 1 request tới peer, ghi nhận latency/lỗi. Lỗi mạng được raise lại."""
+        session = self._session(peer)
+        timeout = timeout or self.peer_timeouts.get(peer, self.timeout)
+        started = time.perf_counter()
+        try:
+            res = session.request(method, f"{peer}{path}", timeout=timeout, **kwargs)
+        except Exception as e:
+            self._record(peer, None, error=str(e))
+            raise
+        error = f"HTTP {res.status_code}" if res.status_code >= 500 else None
+        self._record(peer, time.perf_counter() - started, error=error, size=len(res.content))
+        return res
+
+    def get(self, peer, path, **kwargs):
+        return self.request("GET", peer, path, **kwargs)
+
+    def post(self, peer, path, **kwargs):
+        return self.request("POST", peer, path, **kwargs)
+
+    def _record(self, peer, latency, error=None, size=0):
+        with self._lock:
+            stats = self._stats.setdefault(peer, PeerStats())
+            stats.requests += 1
+            stats.bytes_received += size
+            if error is not None:
+                stats.failures += 1
+                stats.last_error = error
+            else:
+                stats.total_latency += latency
+                stats.last_latency = latency
+
+    # ---------- FAN-OUT ----------
+    def broadcast(self, peers, path, json=None, wire=None, **kwargs):
+        """
+        POST tới mọi peer song song, không chờ kết quả. Trả về list future.
+        wire: bytes nhị phân tương đương `json`, gửi cho peer hỗ trợ wire.
+        """
+        return [
+            self._executor.submit(self._post_quietly, peer, path, json, wire, kwargs)
+            for peer in list(peers)
+        ]
+
+    def _post_quietly(self, peer, path, json, wire, kwargs):
+        try:
+            if wire is not None and self.supports_wire(peer):
+                return self.post(peer, path, data=wire,
+                                 headers={"Content-Type": WIRE_CONTENT_TYPE}, **kwargs)
+            return self.post(peer, path, json=json, **kwargs)
+        except Exception as e:
+            print(f"⚠ Không gửi được {path} tới {peer}: {e}")
+            return None
+
+    def map(self, peers, fn, timeout=None):
+        """
+        Chạy fn(peer) song song, trả về dict peer -> kết quả (hoặc Exception).
+        timeout: không chờ peer chậm quá số giây này (kết quả là TimeoutError).
+        """
+        futures = {peer: self._executor.submit(fn, peer) for peer in list(peers)}
+        done, _ = wait(futures.values(), timeout=timeout)
+        results = {}
+        for peer, future in futures.items():
+            if future not in done:
+                results[peer] = TimeoutError(f"quá {timeout}s")
+                continue
+            try:
+                results[peer] = future.result()
+            except Exception as e:
+                results[peer] = e
+        return results
+
+    def latency(self, peer):
+        """Latency trung bình của peer (None nếu chưa có request thành công)."""
+        with self._lock:
+            stats = self._stats.get(peer)
+            return stats.avg_latency if stats is not None else None
+
+    def stats(self):
+        with self._lock:
+            return {peer: stats.to_dict() for peer, stats in self._stats.items()}
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """Dispatcher dùng chung cho cả node (tạo lazy)."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = GossipDispatcher()
+        return _default
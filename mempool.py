@@ -0,0 +1,236 @@
+# mempool.py
+import bisect
+import itertools
+import json
+import math
+import threading
+from collections import deque
+from collections.abc import Mapping
+
+from merkle import tx_hash
+
+ORDER_FEE = "fee"
+ORDER_ARRIVAL = "arrival"
+
+
+def content_digest(transaction):
+    """Digest nội dung tx, bỏ qua field tx_id mà miner gắn vào khi đưa vào block."""
+    if isinstance(transaction, Mapping) and "tx_id" in transaction:
+        transaction = {key: value for key, value in transaction.items() if key != "tx_id"}
+    return tx_hash(transaction)
+
+
+class MempoolEntry:
+    def __init__(self, tx_id, transaction, seq):
+        self.tx_id = tx_id
+        self.transaction = transaction
+        self.seq = seq
+        self.digest = content_digest(transaction)
+        # kích thước tính theo dạng nằm trong block (đã gắn tx_id)
+        block_tx = self.block_transaction()
+        self.size = len(json.dumps(block_tx, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+        try:
+            self.fee = float(transaction.get("fee", 0))
+        except (AttributeError, TypeError, ValueError):
+            self.fee = 0.0
+        # nan/inf làm hỏng thứ tự của _ranked (bisect xoá nhầm entry) -> coi như fee 0
+        if not math.isfinite(self.fee):
+            self.fee = 0.0
+
+    def block_transaction(self):
+        """Tx đưa vào block: gắn tx_id gossip để tra cứu được qua /tx/<tx_id>."""
+        if isinstance(self.transaction, dict) and "tx_id" not in self.transaction:
+            return {**self.transaction, "tx_id": self.tx_id}
+        return self.transaction
+
+
+class Mempool:
+    """
+    Mempool thread-safe:
+    - chống trùng theo tx_id
+    - giới hạn số tx / tổng bytes, đầy thì loại tx có ưu tiên thấp nhất
+    - sắp xếp theo fee (cao trước) hoặc theo thời điểm đến
+    - take_batch() lấy tx cho block, put_back() trả lại khi đào thất bại
+    """
+
+    def __init__(self, max_txs=10000, max_bytes=8 * 1024 * 1024, order=ORDER_FEE, confirmed_memory=10000):
+        self.max_txs = max_txs
+        self.max_bytes = max_bytes
+        self.order = order
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._entries = {}   # tx_id -> MempoolEntry
+        self._ranked = []    # list[(priority key, tx_id)], tốt nhất ở đầu
+        self._by_digest = {}  # digest nội dung tx -> set tx_id
+        self._bytes = 0
+        # digest của tx vừa vào block, để put_back không trả lại tx đã xác nhận
+        self._confirmed = set()
+        self._confirmed_order = deque()
+        self._confirmed_memory = confirmed_memory
+
+    def _key(self, entry):
+        if self.order == ORDER_FEE:
+            return (-entry.fee, entry.seq)
+        return (entry.seq,)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, tx_id):
+        with self._lock:
+            return tx_id in self._entries
+
+    @property
+    def size_bytes(self):
+        with self._lock:
+            return self._bytes
+
+    # ---------- INSERT ----------
+    def add(self, tx_id, transaction):
+        """Thêm 1 tx. Trả về False nếu không phải object JSON, trùng hoặc bị loại do mempool đầy."""
+        if not isinstance(transaction, dict):
+            return False
+        with self._lock:
+            if tx_id in self._entries:
+                return False
+            return self._insert(MempoolEntry(tx_id, transaction, next(self._seq)))
+
+    def add_many(self, items):
+        """items: iterable (tx_id, transaction). Trả về list tx_id đã thêm."""
+        added = []
+        with self._lock:
+            for tx_id, transaction in items:
+                if not isinstance(transaction, dict) or tx_id in self._entries:
+                    continue
+                if self._insert(MempoolEntry(tx_id, transaction, next(self._seq))):
+                    added.append(tx_id)
+        return added
+
+    def _insert(self, entry):
+        if entry.size > self.max_bytes:
+            return False
+        key = self._key(entry)
+
+        # chọn trước các tx sẽ bị loại; chỉ loại thật khi tx mới chắc chắn được nhận
+        evict = 0
+        count, size = len(self._entries), self._bytes
+        while count >= self.max_txs or size + entry.size > self.max_bytes:
+            worst_key, worst_id = self._ranked[-1 - evict]
+            if worst_key < key:
+                # tx mới còn kém hơn tx tệ nhất -> không nhận
+                return False
+            evict += 1
+            count -= 1
+            size -= self._entries[worst_id].size
+        if evict:
+            for _, worst_id in self._ranked[-evict:]:
+                self._forget(worst_id)
+            del self._ranked[-evict:]
+
+        self._entries[entry.tx_id] = entry
+        self._by_digest.setdefault(entry.digest, set()).add(entry.tx_id)
+        bisect.insort(self._ranked, (key, entry.tx_id))
+        self._bytes += entry.size
+        return True
+
+    def _forget(self, tx_id):
+        # xoá khỏi _entries/_by_digest; _ranked do caller tự xử lý
+        entry = self._entries.pop(tx_id)
+        same = self._by_digest[entry.digest]
+        same.discard(tx_id)
+        if not same:
+            del self._by_digest[entry.digest]
+        self._bytes -= entry.size
+        return entry
+
+    # ---------- BLOCK ASSEMBLY ----------
+    def take_batch(self, max_txs=None, max_bytes=None):
+        """Lấy (và xoá khỏi mempool) các tx ưu tiên cao nhất vừa giới hạn block."""
+        with self._lock:
+            taken = []
+            total = 0
+            for _, tx_id in self._ranked:
+                if max_txs is not None and len(taken) >= max_txs:
+                    break
+                entry = self._entries[tx_id]
+                if max_bytes is not None and total + entry.size > max_bytes:
+                    break
+                taken.append(entry)
+                total += entry.size
+
+            del self._ranked[:len(taken)]
+            for entry in taken:
+                self._forget(entry.tx_id)
+            return taken
+
+    def put_back(self, entries):
+        """
+        Trả lại tx của vòng đào thất bại / bị dừng (giữ thứ tự cũ).
+        Tx có nội dung vừa vào block (từ peer) trong lúc đào thì không trả lại.
+        """
+        with self._lock:
+            for entry in entries:
+                if entry.tx_id not in self._entries and entry.digest not in self._confirmed:
+                    self._insert(entry)
+
+    def restore(self, items):
+        """
+        Trả lại tx của block bị bỏ khi đổi nhánh. items: iterable (tx_id, transaction).
+        Tx không còn nằm trong block nào nên bỏ khỏi tập đã xác nhận trước khi thêm.
+        """
+        with self._lock:
+            for tx_id, transaction in items:
+                entry = MempoolEntry(tx_id, transaction, next(self._seq))
+                self._confirmed.discard(entry.digest)
+                if tx_id not in self._entries:
+                    self._insert(entry)
+
+    def discard_included(self, transactions):
+        """Xoá các tx đã nằm trong block (so theo tx_id gắn trong tx, hoặc nội dung tx)."""
+        digests = {content_digest(tx) for tx in transactions}
+        tx_ids = {tx.get("tx_id") for tx in transactions if isinstance(tx, Mapping)}
+        with self._lock:
+            for digest in digests:
+                if digest not in self._confirmed:
+                    self._confirmed.add(digest)
+                    self._confirmed_order.append(digest)
+            while len(self._confirmed_order) > self._confirmed_memory:
+                self._confirmed.discard(self._confirmed_order.popleft())
+
+            doomed = set()
+            for digest in digests:
+                doomed.update(self._by_digest.get(digest, ()))
+            doomed.update(tx_id for tx_id in tx_ids if tx_id in self._entries)
+            for tx_id in doomed:
+                entry = self._forget(tx_id)
+                key = (self._key(entry), tx_id)
+                del self._ranked[bisect.bisect_left(self._ranked, key)]
+
+    def transactions(self):
+        with self._lock:
+            return [self._entries[tx_id].transaction for _, tx_id in self._ranked]
+
+    def check_consistency(self):
+        """
+        Kiểm tra _ranked / _entries / _by_digest / _bytes còn khớp nhau.
+        Trả về list mô tả chỗ lệch (rỗng nếu ổn).
+        """
+        problems = []
+        with self._lock:
+            if any(a > b for a, b in zip(self._ranked, self._ranked[1:])):
+                problems.append("_ranked không còn được sắp xếp")
+            ranked_ids = [tx_id for _, tx_id in self._ranked]
+            if len(ranked_ids) != len(self._entries) or set(ranked_ids) != set(self._entries):
+                problems.append("_ranked và _entries chứa tx khác nhau")
+            for key, tx_id in self._ranked:
+                entry = self._entries.get(tx_id)
+                if entry is not None and self._key(entry) != key:
+                    problems.append(f"key của {tx_id} trong _ranked bị lệch")
+            indexed = {tx_id for same in self._by_digest.values() for tx_id in same}
+            if indexed != set(self._entries):
+                problems.append("_by_digest và _entries chứa tx khác nhau")
+            total = sum(entry.size for entry in self._entries.values())
+            if total != self._bytes:
+                problems.append(f"_bytes = {self._bytes}, tổng thực tế = {total}")
+        return problems
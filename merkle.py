@@ -0,0 +1,80 @@
+# merkle.py
+import hashlib
+import json
+
+from transaction import Transaction
+
+EMPTY_ROOT = "0" * 64
+
+
+def tx_hash(tx):
+    """Hash của 1 transaction = sha256 của JSON chuẩn hoá (giống cách hash block)."""
+    if type(tx) is Transaction:
+        canonical = tx.canonical()
+    else:
+        canonical = json.dumps(tx, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _hash_pair(left, right):
+    return hashlib.sha256(bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+def _next_level(level):
+    # số node lẻ -> nhân đôi node cuối (giống Bitcoin)
+    if len(level) % 2 == 1:
+        level = level + [level[-1]]
+    return [_hash_pair(level[i], level[i + 1]) for i in range(0, len(level), 2)]
+
+
+def merkle_root(transactions):
+    return merkle_root_checked(transactions)[0]
+
+
+def merkle_root_checked(transactions):
+    """
+    (root, mutated). mutated=True khi có 2 node anh em giống hệt nhau ở 1 level:
+    vì node lẻ được nhân đôi, [a, b, c] và [a, b, c, c] cho cùng root,
+    nên danh sách như vậy phải bị từ chối (giống kiểm tra "mutated" của Bitcoin).
+    """
+    level = [tx_hash(tx) for tx in transactions]
+    if not level:
+        return EMPTY_ROOT, False
+    mutated = False
+    while len(level) > 1:
+        if not mutated:
+            mutated = any(level[i] == level[i + 1] for i in range(0, len(level) - 1, 2))
+        level = _next_level(level)
+    return level[0], mutated
+
+
+def merkle_proof(transactions, position):
+    """
+    Trả về list các bước {"hash": sibling, "side": "left"|"right"}
+    từ lá lên tới root cho transaction ở vị trí `position`.
+    """
+    if position < 0 or position >= len(transactions):
+        raise IndexError("position nằm ngoài danh sách transaction")
+
+    level = [tx_hash(tx) for tx in transactions]
+    proof = []
+    while len(level) > 1:
+        if len(level) % 2 == 1:
+            level = level + [level[-1]]
+        if position % 2 == 0:
+            proof.append({"hash": level[position + 1], "side": "right"})
+        else:
+            proof.append({"hash": level[position - 1], "side": "left"})
+        level = _next_level(level)
+        position //= 2
+    return proof
+
+
+def verify_proof(tx, proof, root):
+    current = tx_hash(tx)
+    for step in proof:
+        if step["side"] == "left":
+            current = _hash_pair(step["hash"], current)
+        else:
+            current = _hash_pair(current, step["hash"])
+    return current == root
@@ -1,25 +1,29 @@
 # node.py
 from flask import Flask
 from ObservablePeers import ObservablePeers
-from blockchain import Blockchain
-from api import register_routes
-from MainView import NodeGUI
+from blockChain import Blockchain
+from chain_store import ChainStore
+from api import register_routes, broadcast_new_block
+from gossip import GossipDispatcher
+from sync_scheduler import SyncScheduler
+from mempool import Mempool
+from node_log import LogSink
 import requests
 from dotenv import load_dotenv
 import time
 
+import argparse
 import threading
 import os
-import tkinter as tk
 import random
 import string
 
-# ====== TẠO NODE (blockchain + flask) ======
-blockchain = Blockchain(difficulty=5)
-peers = ObservablePeers()
-memPool = []
-
+# ====== CẤU HÌNH NODE ======
+# object của node (store, blockchain, mempool...) chỉ tạo trong __main__:
+# process con của pool spawn import lại file này dưới tên __mp_main__
 load_dotenv()
+CHAIN_DIR = os.getenv("CHAIN_DIR") or os.path.join("chain_data", os.environ.get("PORT", "5001"))
+
 INDEX_ADDRESS = os.getenv("INDEX_ADDRESS")
 MY_ADDRESS = os.getenv("MY_ADDRESS")
 
@@ -34,46 +38,101 @@ def get_port():
     return int(os.environ.get("PORT", 5001))
 
 def miner(stop_event):
-    global memPool
-
     while True:
         try:
             if len(memPool) > 0:
-                gui.add_log("đang đào block mới")
+                add_log("đang đào block mới")
                 stop_event.clear()
-                new_block = blockchain.miner(memPool, WALLET_ADDRESS, stop_event, add_log=gui.add_log)
+                new_block = blockchain.miner(memPool, WALLET_ADDRESS, stop_event, add_log=add_log)
 
                 if(new_block):
                     try:
-                        gui.add_log("đang broadcast đến các node khác")
-                        for peer in peers:
-                            res = requests.post(f"{peer}/blocks/receive", json=new_block.to_dict())
-                        gui.add_log("broadcast xong")
+                        add_log("đang broadcast đến các node khác")
+                        broadcast_new_block(new_block, peers, gossip)
+                        add_log("đã gửi block, peers nhận ở chế độ nền")
                     except Exception as e:
                         print("lỗi1: ", e)
         except Exception as e:
             print("lỗi2: ", e)
         time.sleep(1)
 
-def run_flask():
+def run_flask(server="flask", threads=8):
     """
-    Chạy Flask server trong thread riêng.
-    use_reloader=False để tránh tạo process phụ.
+    Chạy HTTP server trong thread riêng.
+    - "waitress": WSGI server production, nhiều thread trong CÙNG process
+      (chain/mempool/peers là object trong bộ nhớ nên không dùng
+      server nhiều process như gunicorn -w N, mỗi worker sẽ có state riêng).
+    - "flask": server dev của Flask (threaded), use_reloader=False để tránh tạo process phụ.
     """
     port = get_port()
+    if server == "waitress":
+        try:
+            from waitress import serve
+        except ImportError:
+            print("Chưa cài waitress (pip install waitress), dùng server dev của Flask")
+        else:
+            print(f"Đang chạy node (waitress, {threads} thread) trên port {port}...")
+            serve(app, host="0.0.0.0", port=port, threads=threads)
+            return
+
     print(f"Đang chạy node Flask trên port {port}...")
-    app.run(host="0.0.0.0", port=port, use_reloader=False)
+    app.run(host="0.0.0.0", port=port, use_reloader=False, threaded=True)
 
 WALLET_ADDRESS = os.getenv("WALLET_ADDRESS") or generate_address()
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Blockchain node")
+    parser.add_argument("--headless", action="store_true",
+                        help="chạy không GUI (không import tkinter); xem bằng dashboard.py")
+    parser.add_argument("--server", choices=["flask", "waitress"],
+                        default=os.getenv("NODE_SERVER", "flask"),
+                        help="HTTP server cho API (waitress cho production)")
+    parser.add_argument("--threads", type=int, default=int(os.getenv("NODE_THREADS", "8")),
+                        help="số thread xử lý request khi dùng waitress")
+    return parser.parse_args()
+
 if __name__ == "__main__":
+    args = parse_args()
+
+    # ====== TẠO NODE (blockchain + flask) ======
+    gossip = GossipDispatcher()
+    memPool = Mempool()
+    blockchain = Blockchain(
+        difficulty=5,
+        mining_workers=int(os.getenv("MINER_WORKERS") or os.cpu_count() or 1),
+        validation_workers=int(os.getenv("VALIDATION_WORKERS") or os.cpu_count() or 1),
+        verify_balance_index=os.getenv("BALANCE_INDEX_CHECK") == "1",
+        store=ChainStore(CHAIN_DIR),
+        gossip=gossip,
+        mempool=memPool,
+    )
+    peers = ObservablePeers()
+    # mọi log của node đi qua đây; có GUI thì GUI đăng ký làm listener
+    log_sink = LogSink()
+    add_log = log_sink.add_log
+    # mọi lần sync chain (bootstrap, block orphan) đi qua scheduler này
+    sync_scheduler = SyncScheduler(blockchain, peers, add_log)
+
+    # pool đào / validate tạo trước mọi thread (GUI, Flask, gossip, miner)
+    blockchain.start_workers()
+
+    root = None
+    if not args.headless:
+        # chỉ import Tk khi thật sự cần GUI
+        import tkinter as tk
+        from MainView import NodeGUI
+
+        root = tk.Tk()
+        gui = NodeGUI(root, blockchain, peers, MY_ADDRESS ,wallet_address=WALLET_ADDRESS)
+        log_sink.add_listener(gui.add_log)
 
-    root = tk.Tk()
-    gui = NodeGUI(root, blockchain, peers, MY_ADDRESS ,wallet_address=WALLET_ADDRESS)
     stop_mining_event = threading.Event()
-    register_routes(app, blockchain, peers, memPool, gui.add_log, stop_mining_event)
+    # long-poll /watch dùng tối đa nửa số thread của waitress, phần còn lại cho peer / ví
+    register_routes(app, blockchain, peers, memPool, add_log, stop_mining_event, gossip,
+                    wallet_address=WALLET_ADDRESS, log_sink=log_sink, sync_scheduler=sync_scheduler,
+                    max_watchers=max(1, args.threads // 2))
 
-    flask_thread = threading.Thread(target=run_flask, daemon=True)
+    flask_thread = threading.Thread(target=run_flask, args=(args.server, args.threads), daemon=True)
     flask_thread.start()
 
     print("my address", MY_ADDRESS)
@@ -81,25 +140,31 @@ if __name__ == "__main__":
 
     if MY_ADDRESS != INDEX_ADDRESS:
         try:
-            gui.add_log("đang lấy thông tin các node khác từ index")
+            add_log("đang lấy thông tin các node khác từ index")
             peers.add(INDEX_ADDRESS)
 
-            res = requests.get(f"{INDEX_ADDRESS}/peers", timeout=3)
+            res = gossip.get(INDEX_ADDRESS, "/peers")
             data = res.json()
             for peer in data.get("peers", []):
                 if peer != MY_ADDRESS:
                     peers.add(peer)
-            blockchain.sync_chain(peers, gui.add_log)
-            gui.add_log("đã cập nhậ dữ liệu")
-            for peer in peers:
-                requests.post(f"{peer}/peers/add", json={"peer":f"{MY_ADDRESS}"})
-            blockchain.sync_chain(peers, gui.add_log)
+            sync_scheduler.request("bootstrap", wait=True)
+            add_log("đã cập nhậ dữ liệu")
+            gossip.broadcast(peers, "/peers/add", json={"peer": f"{MY_ADDRESS}"})
+            sync_scheduler.request("bootstrap", wait=True)
         except requests.RequestException as e:
             print("Không kết nối được đến bootstrap node:", e)
 
-    # 3) Chạy Tkinter GUI trong thread chính (nếu bạn dùng GUI)
-    
     miner_thread = threading.Thread(target=miner, args = (stop_mining_event,),daemon=True)
     miner_thread.start()
 
-    root.mainloop()
+    if root is not None:
+        # 3) Chạy Tkinter GUI trong thread chính
+        root.mainloop()
+    else:
+        # headless: giữ main thread sống tới khi Flask dừng / Ctrl+C
+        try:
+            while flask_thread.is_alive():
+                flask_thread.join(1)
+        except KeyboardInterrupt:
+            print("Đang dừng node...")
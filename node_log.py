@@ -0,0 +1,69 @@
+# node_log.py
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+
+class JsonFormatter(logging.Formatter):
+    """Mỗi dòng log là 1 object JSON (ts, level, logger, msg, + field thêm)."""
+
+    def format(self, record):
+        data = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        data.update(getattr(record, "fields", {}))
+        return json.dumps(data, ensure_ascii=False)
+
+
+class LogSink:
+    """
+    Thay cho gui.add_log khi chạy headless:
+    - ghi log có cấu trúc (JSON lines) qua logging
+    - giữ `capacity` dòng cuối để client (dashboard) đọc qua /logs
+    - listener (vd NodeGUI.add_log) nhận thêm từng dòng nếu có GUI
+    """
+
+    def __init__(self, name="node", capacity=1000, level=logging.INFO, stream=None):
+        self.logger = logging.getLogger(name)
+        if not self.logger.handlers:
+            handler = logging.StreamHandler(stream)
+            handler.setFormatter(JsonFormatter())
+            self.logger.addHandler(handler)
+            self.logger.setLevel(level)
+            self.logger.propagate = False
+
+        self._entries = deque(maxlen=capacity)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def add_log(self, msg, **fields):
+        self.logger.info(msg, extra={"fields": fields})
+        with self._lock:
+            self._seq += 1
+            self._entries.append({"seq": self._seq, "ts": time.time(), "msg": str(msg)})
+        for cb in list(self._listeners):
+            try:
+                cb(msg)
+            except Exception as e:
+                print("Log listener error:", e)
+
+    def since(self, seq=0, limit=500):
+        """Các dòng có seq > `seq` (tối đa `limit` dòng)."""
+        with self._lock:
+            entries = [entry for entry in self._entries if entry["seq"] > seq]
+        return entries[:limit]
+
+    @property
+    def last_seq(self):
+        with self._lock:
+            return self._seq
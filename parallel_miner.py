@@ -0,0 +1,212 @@
+# parallel_miner.py
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+
+# số nonce mỗi worker thử trước khi kiểm tra cờ dừng
+CHECK_EVERY = 1024
+
+_halt_event = None
+# context dùng cho mọi pool của process, chọn 1 lần ở lần gọi pool_context() đầu tiên
+_context = None
+_context_lock = threading.Lock()
+
+
+def pool_context():
+    """
+    Context cho mọi process pool (đào / validate). fork chỉ an toàn khi process
+    mới có 1 thread (fork lúc thread khác đang giữ lock -> process con có thể treo),
+    nên start method được chọn 1 lần, trước khi tạo pool nào
+    (Blockchain.start_workers lúc khởi động); chọn muộn hơn thì dùng spawn.
+    start_workers tạo luôn các pool còn lại với cùng context, lúc đó thread
+    có thêm chỉ là thread quản lý của pool trước (nếu không, pool validate
+    luôn rơi về spawn và process con nạp lại node.py).
+    """
+    global _context
+    with _context_lock:
+        if _context is None:
+            if threading.active_count() == 1 and "fork" in multiprocessing.get_all_start_methods():
+                _context = multiprocessing.get_context("fork")
+            else:
+                _context = multiprocessing.get_context("spawn")
+        return _context
+
+
+def _init_worker(halt_event):
+    global _halt_event
+    _halt_event = halt_event
+
+
+def _search(job, difficulty, worker_id, step):
+    """
+    Chạy trong process con: worker_id thử các nonce
+    start + worker_id, start + worker_id + step, ...
+    job là (prefix, suffix, start) từ Block.hash_template(), hoặc Block nếu
+    không dựng được template.
+    Trả về (worker_id, nonce|None, hash|None, số hash đã thử, thời gian chạy).
+    """
+    target_prefix = "0" * difficulty
+    if isinstance(job, tuple):
+        prefix, suffix, start = job
+        prefix_state = hashlib.sha256(prefix)
+
+        def hash_at(n):
+            h = prefix_state.copy()
+            h.update(str(n).encode("ascii"))
+            h.update(suffix)
+            return h.hexdigest()
+    else:
+        start = job.nonce
+
+        def hash_at(n):
+            job.nonce = n
+            return job.calculate_hash()
+
+    nonce = start + worker_id
+    hashes = 0
+    started = time.perf_counter()
+
+    while True:
+        if hashes % CHECK_EVERY == 0 and _halt_event.is_set():
+            return worker_id, None, None, hashes, time.perf_counter() - started
+
+        block_hash = hash_at(nonce)
+        hashes += 1
+        if block_hash.startswith(target_prefix):
+            _halt_event.set()
+            return worker_id, nonce, block_hash, hashes, time.perf_counter() - started
+        nonce += step
+
+
+class WorkerStats:
+    def __init__(self, worker_id, hashes, elapsed):
+        self.worker_id = worker_id
+        self.hashes = hashes
+        self.elapsed = elapsed
+
+    @property
+    def hash_rate(self):
+        return self.hashes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def to_dict(self):
+        return {
+            "worker_id": self.worker_id,
+            "hashes": self.hashes,
+            "elapsed": self.elapsed,
+            "hash_rate": self.hash_rate,
+        }
+
+
+class MiningReport:
+    def __init__(self, found, elapsed, workers):
+        self.found = found
+        self.elapsed = elapsed
+        self.workers = workers  # list[WorkerStats]
+
+    @property
+    def total_hashes(self):
+        return sum(w.hashes for w in self.workers)
+
+    @property
+    def hash_rate(self):
+        return self.total_hashes / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self):
+        per_worker = ", ".join(f"w{w.worker_id}: {w.hash_rate:,.0f} H/s" for w in self.workers)
+        return f"{len(self.workers)} worker, tổng {self.hash_rate:,.0f} H/s ({per_worker})"
+
+    def to_dict(self):
+        return {
+            "found": self.found,
+            "elapsed": self.elapsed,
+            "total_hashes": self.total_hashes,
+            "hash_rate": self.hash_rate,
+            "workers": [w.to_dict() for w in self.workers],
+        }
+
+
+class ParallelMiner:
+    """
+    Chia không gian nonce cho một pool process (mỗi worker một "làn" nonce
+    cách nhau `workers` bước), vẫn tôn trọng stop_mining_event của node.
+    Pool được tạo lazy (hoặc sớm bằng start()) và giữ lại giữa các block.
+    """
+
+    def __init__(self, workers=None, poll_interval=0.05):
+        self.workers = workers or os.cpu_count() or 1
+        self.poll_interval = poll_interval
+        self.last_report = None
+        self._pool = None
+        self._halt = None
+
+    def start(self):
+        """Tạo pool ngay (gọi trước khi node chạy thread khác)."""
+        self._ensure_pool()
+
+    def _ensure_pool(self):
+        if self._pool is None:
+            ctx = pool_context()
+            self._halt = ctx.Event()
+            self._pool = ctx.Pool(
+                processes=self.workers,
+                initializer=_init_worker,
+                initargs=(self._halt,),
+            )
+        return self._pool
+
+    def mine(self, block, difficulty, stop_mining_event):
+        """
+        Đào block song song. Khi tìm được, gán nonce + hash vào chính `block`.
+        Trả về MiningReport (found=False nếu bị dừng giữa chừng).
+        """
+        pool = self._ensure_pool()
+        self._halt.clear()
+        started = time.perf_counter()
+
+        # chỉ gửi prefix/suffix đã serialize sẵn cho worker, không gửi cả block
+        template = block.hash_template()
+        job = (template[0], template[1], int(block.nonce)) if template else block
+
+        pending = [
+            pool.apply_async(_search, (job, difficulty, worker_id, self.workers))
+            for worker_id in range(self.workers)
+        ]
+
+        winner = None
+        stats = []
+        while pending:
+            if stop_mining_event.is_set():
+                self._halt.set()
+
+            still_running = []
+            for result in pending:
+                if not result.ready():
+                    still_running.append(result)
+                    continue
+                worker_id, nonce, block_hash, hashes, elapsed = result.get()
+                stats.append(WorkerStats(worker_id, hashes, elapsed))
+                if nonce is not None and (winner is None or nonce < winner[0]):
+                    winner = (nonce, block_hash)
+            pending = still_running
+
+            if pending:
+                time.sleep(self.poll_interval)
+
+        if winner is not None and not stop_mining_event.is_set():
+            block.nonce, block.hash = winner
+
+        stats.sort(key=lambda w: w.worker_id)
+        self.last_report = MiningReport(
+            found=winner is not None and not stop_mining_event.is_set(),
+            elapsed=time.perf_counter() - started,
+            workers=stats,
+        )
+        return self.last_report
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
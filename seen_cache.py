@@ -0,0 +1,80 @@
+# seen_cache.py
+import threading
+import time
+from collections import OrderedDict
+
+
+class SeenCache:
+    """
+    Tập "đã thấy" có giới hạn cho gossip (tx_id, hash block):
+    - tối đa `capacity` key, vượt quá thì bỏ key cũ nhất (LRU)
+    - key không được thấy lại trong `ttl` giây thì coi như chưa thấy
+    Dùng dict chính xác nên không có false positive: một tx mới không bao giờ
+    bị bỏ nhầm như với Bloom filter.
+    """
+
+    def __init__(self, capacity=100_000, ttl=3600, clock=time.monotonic):
+        self.capacity = capacity
+        self.ttl = ttl
+        self._clock = clock
+        self._items = OrderedDict()  # key -> thời điểm thấy
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expire(self, now):
+        if self.ttl is None:
+            return
+        deadline = now - self.ttl
+        while self._items:
+            key, seen_at = next(iter(self._items.items()))
+            if seen_at > deadline:
+                break
+            self._items.popitem(last=False)
+            self.expirations += 1
+
+    def check_and_add(self, key):
+        """True nếu key đã thấy (trùng), False nếu mới (và ghi nhận key)."""
+        with self._lock:
+            now = self._clock()
+            self._expire(now)
+            if key in self._items:
+                self.hits += 1
+                self._items.move_to_end(key)
+                self._items[key] = now
+                return True
+
+            self.misses += 1
+            self._items[key] = now
+            while len(self._items) > self.capacity:
+                self._items.popitem(last=False)
+                self.evictions += 1
+            return False
+
+    def discard(self, key):
+        """Bỏ key (vd xử lý thất bại sau check_and_add) để lần gửi lại không bị coi là trùng."""
+        with self._lock:
+            self._items.pop(key, None)
+
+    def __contains__(self, key):
+        with self._lock:
+            self._expire(self._clock())
+            return key in self._items
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._items),
+                "capacity": self.capacity,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
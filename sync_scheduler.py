@@ -0,0 +1,167 @@
+# sync_scheduler.py
+import threading
+import time
+from collections import deque
+
+# khoảng cách tối thiểu giữa 2 lần bắt đầu sync (giây)
+SYNC_MIN_INTERVAL = 2
+# backoff cho peer lỗi: BASE * 2^(số lần lỗi - 1), tối đa MAX (giây)
+PEER_BACKOFF_BASE = 5
+PEER_BACKOFF_MAX = 300
+# số lần sync gần nhất giữ lại để xem metric
+SYNC_HISTORY = 50
+
+
+class SyncScheduler:
+    """
+    Gom mọi yêu cầu sync (block orphan, bootstrap...) thành tối đa 1 lần sync
+    đang chạy; yêu cầu đến trong lúc chạy chỉ gây thêm đúng 1 lần chạy lại.
+    Peer lỗi bị bỏ qua một thời gian (backoff tăng gấp đôi), mỗi lần sync
+    được ghi lại thời gian, bytes tải về và kết quả.
+    """
+
+    def __init__(self, blockchain, peers, add_log, min_interval=SYNC_MIN_INTERVAL,
+                 backoff_base=PEER_BACKOFF_BASE, backoff_max=PEER_BACKOFF_MAX):
+        self.blockchain = blockchain
+        self.peers = peers
+        self.add_log = add_log
+        self.min_interval = min_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._cond = threading.Condition()
+        self._running = False
+        self._rerun = False
+        self._reasons = []
+        self._started = 0
+        self._finished = 0
+        self._last_start = float("-inf")
+
+        self._backoff = {}   # peer -> (số lần lỗi liên tiếp, thời điểm được thử lại)
+        self._history = deque(maxlen=SYNC_HISTORY)
+        self._totals = {"requests": 0, "coalesced": 0, "runs": 0, "updated": 0,
+                        "unchanged": 0, "skipped": 0, "error": 0, "bytes": 0}
+
+    def request(self, reason="", wait=False, timeout=None):
+        """
+        Yêu cầu 1 lần sync. Trả về True nếu tạo thread sync mới,
+        False nếu được gộp vào lần đang chạy / lần chạy lại.
+        wait=True: chờ tới khi 1 lần sync bắt đầu sau yêu cầu này chạy xong.
+        """
+        with self._cond:
+            self._totals["requests"] += 1
+            if reason:
+                self._reasons.append(reason)
+            target = self._started + 1
+            started = not self._running
+            if started:
+                self._running = True
+                threading.Thread(target=self._loop, daemon=True, name="sync").start()
+            else:
+                self._rerun = True
+                self._totals["coalesced"] += 1
+
+            if wait:
+                self._cond.wait_for(lambda: self._finished >= target, timeout)
+        return started
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                self._started += 1
+                self._rerun = False
+                reasons, self._reasons = self._reasons, []
+                delay = self._last_start + self.min_interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            try:
+                self._run_once(reasons)
+            except Exception as e:
+                print("Lỗi sync:", e)
+
+            with self._cond:
+                self._finished += 1
+                self._cond.notify_all()
+                if not self._rerun:
+                    self._running = False
+                    return
+
+    # ---------- 1 LẦN SYNC ----------
+    def _eligible_peers(self, now):
+        with self._cond:
+            return [peer for peer in list(self.peers)
+                    if self._backoff.get(peer, (0, 0))[1] <= now]
+
+    def _run_once(self, reasons):
+        started_at = time.time()
+        self._last_start = time.monotonic()
+        peers = self._eligible_peers(self._last_start)
+        record = {
+            "started_at": started_at,
+            "reasons": sorted(set(reasons)),
+            "peers": len(peers),
+            "backoff": len(self.peers) - len(peers),
+        }
+
+        if not peers:
+            record.update(duration=0.0, bytes=0, outcome="skipped")
+            self._finish(record)
+            return
+
+        bytes_before = self._bytes_received()
+        report = {}
+        began = time.perf_counter()
+        try:
+            updated = self.blockchain.sync_chain(peers, self.add_log, report=report)
+            outcome = "updated" if updated else "unchanged"
+        except Exception as e:
+            record["error"] = str(e)
+            outcome = "error"
+
+        record.update(
+            duration=time.perf_counter() - began,
+            bytes=max(0, self._bytes_received() - bytes_before),
+            outcome=outcome,
+            source=report.get("source"),
+            failed_peers=sorted(report.get("errors", {})),
+        )
+        self._update_backoff(report)
+        self._finish(record)
+
+    def _finish(self, record):
+        with self._cond:
+            self._history.append(record)
+            self._totals["runs"] += 1
+            self._totals[record["outcome"]] += 1
+            self._totals["bytes"] += record["bytes"]
+
+    def _bytes_received(self):
+        return sum(stats["bytes_received"] for stats in self.blockchain.gossip.stats().values())
+
+    def _update_backoff(self, report):
+        now = time.monotonic()
+        errors = report.get("errors", {})
+        with self._cond:
+            for peer in report.get("ok", ()):
+                if peer not in errors:
+                    self._backoff.pop(peer, None)
+            for peer in errors:
+                failures = self._backoff.get(peer, (0, 0))[0] + 1
+                delay = min(self.backoff_base * 2 ** (failures - 1), self.backoff_max)
+                self._backoff[peer] = (failures, now + delay)
+
+    # ---------- METRIC ----------
+    def stats(self):
+        now = time.monotonic()
+        with self._cond:
+            return {
+                "running": self._running,
+                "pending_rerun": self._rerun,
+                "totals": dict(self._totals),
+                "recent": list(self._history),
+                "backoff": {
+                    peer: {"failures": failures, "retry_in": max(0.0, until - now)}
+                    for peer, (failures, until) in self._backoff.items()
+                },
+            }
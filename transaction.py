@@ -0,0 +1,99 @@
+# transaction.py
+import json
+import sys
+from collections.abc import Mapping
+
+# đánh dấu field không có trong dict gốc (khác với giá trị None)
+_MISSING = object()
+_FIELDS = frozenset(("from", "to", "amount"))
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+class Transaction(Mapping):
+    """
+    Giao dịch trong block, gọn hơn dict:
+    - __slots__, field from/to/amount riêng, key lạ (tx_id, chữ ký...) giữ trong `extra`
+    - address được intern -> mỗi address chỉ 1 object str cho cả chain
+    - JSON chuẩn hoá (sort_keys, compact) tính 1 lần rồi cache, dùng cho merkle / wire / /chain
+    Vẫn đọc được như dict (tx.get("to"), tx["amount"]); to_dict() trả lại đúng dict ban đầu.
+    """
+    __slots__ = ("sender", "recipient", "amount", "extra", "_canonical")
+
+    def __init__(self, sender=_MISSING, recipient=_MISSING, amount=_MISSING, extra=None):
+        self.sender = _intern(sender)
+        self.recipient = _intern(recipient)
+        self.amount = amount
+        self.extra = extra or None
+        self._canonical = None
+
+    @staticmethod
+    def from_dict(data):
+        if not isinstance(data, dict):
+            # isinstance trên ABC chậm hơn, chỉ kiểm tra khi không phải dict
+            if isinstance(data, Transaction):
+                return data
+            raise ValueError("Transaction phải là object JSON")
+        extra = None
+        if not _FIELDS.issuperset(data):
+            extra = {key: value for key, value in data.items() if key not in _FIELDS}
+        return Transaction(
+            data.get("from", _MISSING),
+            data.get("to", _MISSING),
+            data.get("amount", _MISSING),
+            extra,
+        )
+
+    def to_dict(self):
+        data = {key: value for key, value in self._fields() if value is not _MISSING}
+        if self.extra is not None:
+            data.update(self.extra)
+        return data
+
+    def canonical(self):
+        """JSON chuẩn hoá giống json.dumps(dict, sort_keys=True, separators=(",", ":"))."""
+        if self._canonical is None:
+            self._canonical = json.dumps(self.to_dict(), sort_keys=True, separators=(",", ":"),
+                                         ensure_ascii=False)
+        return self._canonical
+
+    # ---------- giao diện Mapping ----------
+    def _fields(self):
+        yield "from", self.sender
+        yield "to", self.recipient
+        yield "amount", self.amount
+
+    def __getitem__(self, key):
+        if key == "from":
+            value = self.sender
+        elif key == "to":
+            value = self.recipient
+        elif key == "amount":
+            value = self.amount
+        elif self.extra is not None:
+            return self.extra[key]
+        else:
+            raise KeyError(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        for key, value in self._fields():
+            if value is not _MISSING:
+                yield key
+        if self.extra is not None:
+            yield from self.extra
+
+    def __len__(self):
+        fixed = sum(1 for _, value in self._fields() if value is not _MISSING)
+        return fixed + (len(self.extra) if self.extra is not None else 0)
+
+    def __repr__(self):
+        return f"Transaction({self.to_dict()!r})"
+
+    def __reduce__(self):
+        # pickle (process pool khi đào song song) qua dict
+        return Transaction.from_dict, (self.to_dict(),)
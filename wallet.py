@@ -6,6 +6,8 @@ import os
 from dotenv import load_dotenv
 import uuid
 import time
+import queue
+import threading
 
 load_dotenv()
 
@@ -29,13 +31,26 @@ class WalletApp(tk.Tk):
         self.balance_var = tk.StringVar(value="0")
         self.to_var = tk.StringVar(value="")
         self.amount_var = tk.StringVar(value="")
+        # batch mode: Send chỉ xếp hàng, "Send batch" mới gửi cả lô
+        self.batch_mode_var = tk.BooleanVar(value=False)
+        self.batch_label_var = tk.StringVar(value="Send batch (0)")
+        self._pending_batch = []
 
         self._build_ui()
+        # poll_interval_ms chỉ dùng khi node chưa hỗ trợ /watch
         self.poll_interval_ms = 1000
-        self._poll_job = None
+        self.watch_timeout = 25
+        self.pump_interval_ms = 100
+        self._pump_job = None
         self._last_balance = None
 
-        self._start_polling()
+        # thread nền long-poll /watch, đẩy kết quả vào queue;
+        # main thread lấy ra bằng after() nên không chạm Tk từ thread khác
+        self._updates = queue.Queue()
+        self._watch_stop = threading.Event()
+        self._watch_thread = None
+
+        self._start_watching()
         self.protocol("WM_DELETE_WINDOW", self.on_close)
 
 
@@ -137,14 +152,32 @@ class WalletApp(tk.Tk):
             side="left", fill="x", expand=True, padx=(8, 0)
         )
 
+        btn_row = tk.Frame(card_tx, bg="white")
+        btn_row.pack(fill="x", padx=10, pady=(0, 10))
+
+        tk.Checkbutton(
+            btn_row, text="Batch mode",
+            variable=self.batch_mode_var,
+            bg="white", font=("Arial", 10)
+        ).pack(side="left")
+
         tk.Button(
-            card_tx, text="Send",
+            btn_row, text="Send",
             command=self.send_transaction,
             font=("Arial", 11, "bold"),
             bg="#27ae60", fg="white",
             activebackground="#1e8449",
             relief="flat", padx=12, pady=8
-        ).pack(anchor="e", padx=10, pady=(0, 10))
+        ).pack(side="right")
+
+        tk.Button(
+            btn_row, textvariable=self.batch_label_var,
+            command=self.flush_batch,
+            font=("Arial", 10, "bold"),
+            bg="#34495e", fg="white",
+            activebackground="#3d566e",
+            relief="flat", padx=10, pady=8
+        ).pack(side="right", padx=(0, 8))
 
         # Logs
         card_log = tk.LabelFrame(self, text="Logs", bg="white", font=("Arial", 10, "bold"))
@@ -167,26 +200,79 @@ class WalletApp(tk.Tk):
         self.refresh_balance(force=True)
 
 
-    def _start_polling(self):
-        self._stop_polling()
-        self._poll_job = self.after(self.poll_interval_ms, self._poll_tick)
+    def _start_watching(self):
+        self._watch_stop.clear()
+        self._watch_thread = threading.Thread(target=self._watch_loop, daemon=True)
+        self._watch_thread.start()
+        self._pump_job = self.after(self.pump_interval_ms, self._pump_updates)
 
-    def _stop_polling(self):
-        if self._poll_job is not None:
+    def _stop_watching(self):
+        self._watch_stop.set()
+        if self._pump_job is not None:
             try:
-                self.after_cancel(self._poll_job)
+                self.after_cancel(self._pump_job)
             except Exception:
                 pass
-            self._poll_job = None
+            self._pump_job = None
+
+    def _watch_loop(self):
+        """Chạy trên thread nền: chờ node đẩy thay đổi balance/tip."""
+        known_address, known_balance, known_tip = None, None, None
+        while not self._watch_stop.is_set():
+            address = self.address
+            if not address:
+                self._watch_stop.wait(0.5)
+                continue
+            if address != known_address:
+                known_address, known_balance, known_tip = address, None, None
+
+            params = {"timeout": self.watch_timeout}
+            if known_balance is not None:
+                params["balance"] = known_balance
+            if known_tip is not None:
+                params["tip"] = known_tip
 
-    def _poll_tick(self):
-        # chỉ poll khi đã set address
-        if self.address:
-            self.refresh_balance(force=False, log_on_change=True)
-        self._poll_job = self.after(self.poll_interval_ms, self._poll_tick)
+            try:
+                r = requests.get(f"{self.api_base}/watch/{address}", params=params,
+                                 timeout=self.watch_timeout + 5)
+                if r.status_code in (404, 503):
+                    # node cũ chưa có /watch, hoặc node đang giữ đủ long-poll
+                    # -> poll /balance trên thread nền
+                    r = requests.get(f"{self.api_base}/balance/{address}", timeout=5)
+                    r.raise_for_status()
+                    self._updates.put(r.json())
+                    self._watch_stop.wait(self.poll_interval_ms / 1000)
+                    continue
+                r.raise_for_status()
+                data = r.json()
+            except Exception as e:
+                self._updates.put({"address": address, "error": str(e)})
+                self._watch_stop.wait(2)
+                continue
+
+            if data.get("changed"):
+                known_balance = data.get("balance")
+                known_tip = data.get("tip")
+                self._updates.put(data)
+
+    def _pump_updates(self):
+        """Chạy trên main thread (after): áp dụng các update từ thread nền."""
+        latest = None
+        try:
+            while True:
+                latest = self._updates.get_nowait()
+        except queue.Empty:
+            pass
+
+        if latest is not None and latest.get("address") == self.address:
+            if "error" in latest:
+                self.lbl_balance.configure(fg="#e74c3c")
+            else:
+                self._apply_balance(float(latest.get("balance", 0)), log_on_change=True)
+        self._pump_job = self.after(self.pump_interval_ms, self._pump_updates)
 
     def on_close(self):
-        self._stop_polling()
+        self._stop_watching()
         self.destroy()
         
 
@@ -200,18 +286,7 @@ class WalletApp(tk.Tk):
             r = requests.get(f"{self.api_base}/balance/{self.address}", timeout=5)
             r.raise_for_status()
             data = r.json()
-            bal = float(data.get("balance", 0))
-
-            changed = (self._last_balance is None) or (bal != self._last_balance)
-            self._last_balance = bal
-
-            self.balance = bal
-            self.lbl_balance.configure(fg="#2ecc71" if bal >= 0 else "#e74c3c")
-
-            if force:
-                self.add_log(f"Balance updated: {bal:g}")
-            elif log_on_change and changed:
-                self.add_log(f"[POLL] Balance changed: {bal:g}")
+            self._apply_balance(float(data.get("balance", 0)), force=force, log_on_change=log_on_change)
 
         except Exception as e:
             # polling tránh spam log mỗi giây
@@ -220,6 +295,17 @@ class WalletApp(tk.Tk):
             self.lbl_balance.configure(fg="#e74c3c")
             # KHÔNG set balance=0 ở đây để khỏi nhảy số khi backend lag
 
+    def _apply_balance(self, bal, force=False, log_on_change=False):
+        changed = (self._last_balance is None) or (bal != self._last_balance)
+        self._last_balance = bal
+
+        self.balance = bal
+        self.lbl_balance.configure(fg="#2ecc71" if bal >= 0 else "#e74c3c")
+
+        if force:
+            self.add_log(f"Balance updated: {bal:g}")
+        elif log_on_change and changed:
+            self.add_log(f"[PUSH] Balance changed: {bal:g}")
 
 
     def send_transaction(self):
@@ -246,9 +332,10 @@ class WalletApp(tk.Tk):
             messagebox.showerror("Invalid", "Amount must be a valid number > 0.")
             return
 
-        # check balance (đúng logic)
+        # check balance (đúng logic), tính cả các tx đang chờ trong batch
+        pending_amount = sum(p["transaction"]["amount"] for p in self._pending_batch)
         try:
-            if amount > float(self.balance):
+            if amount + pending_amount > float(self.balance):
                 messagebox.showerror("Insufficient", f"Insufficient balance. Current: {self.balance:g}")
                 return
         except Exception:
@@ -267,6 +354,14 @@ class WalletApp(tk.Tk):
             "transaction": transaction
         }
 
+        if self.batch_mode_var.get():
+            self._pending_batch.append(payload)
+            self.batch_label_var.set(f"Send batch ({len(self._pending_batch)})")
+            self.add_log(f"[TX] Queued tx_id={payload['tx_id']} | {transaction}")
+            self.to_var.set("")
+            self.amount_var.set("")
+            return
+
         try:
             r = requests.post(f"{self.api_base}/transactions/new", json=payload, timeout=5)
 
@@ -295,6 +390,49 @@ class WalletApp(tk.Tk):
         self.refresh_balance(force=True)
 
 
+    def flush_batch(self):
+        if not self._pending_batch:
+            messagebox.showinfo("Batch", "No queued transactions.")
+            return
+
+        batch = self._pending_batch
+        try:
+            result = self.submit_batch(batch)
+        except Exception as e:
+            self.add_log(f"[BATCH] Error: {e}")
+            messagebox.showerror("Error", str(e))
+            return
+
+        self._pending_batch = []
+        self.batch_label_var.set("Send batch (0)")
+        msg = (f"accepted={result.get('accepted', 0)} "
+               f"duplicates={result.get('duplicates', 0)} "
+               f"rejected={result.get('rejected', 0)}")
+        self.add_log(f"[BATCH] Submitted {len(batch)} tx | {msg}")
+        messagebox.showinfo("Success", msg)
+        self.refresh_balance(force=True)
+
+    def submit_batch(self, payloads, chunk_size=1000):
+        """
+        Gửi nhiều {tx_id, transaction} qua /transactions/batch
+        (chia chunk theo giới hạn của node). Trả về tổng kết quả.
+        """
+        totals = {"accepted": 0, "duplicates": 0, "rejected": 0}
+        for start in range(0, len(payloads), chunk_size):
+            chunk = payloads[start:start + chunk_size]
+            r = requests.post(f"{self.api_base}/transactions/batch",
+                              json={"transactions": chunk}, timeout=10)
+            if r.status_code not in (200, 201):
+                try:
+                    msg = r.json().get("message", r.text)
+                except Exception:
+                    msg = r.text
+                raise Exception(f"HTTP {r.status_code}: {msg}")
+            data = r.json()
+            for key in totals:
+                totals[key] += int(data.get(key, 0))
+        return totals
+
     def add_log(self, msg: str):
         t = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         self.log_text.configure(state="normal")
@@ -0,0 +1,302 @@
+# wire.py
+"""
+Định dạng nhị phân (tuỳ chọn) cho block / danh sách block / giao dịch.
+JSON vẫn là mặc định; peer chọn định dạng này qua header Accept / Content-Type.
+
+Block:  <BBQdQ32s32sI> version, flags, index, timestamp, nonce,
+        previous_hash (32 byte), hash (32 byte), số tx
+        + transactions theo cột (xem _encode_txs):
+          <I> số string, bảng string (address lặp lại chỉ ghi 1 lần, hex -> bytes),
+          kind mỗi tx (1 byte), cột index from / to, cột amount int64 / float64,
+          <I> + JSON list các field lạ (tx_id...) và tx không đóng gói được
+Danh sách block: <III> length của chain, height bắt đầu, số block + các block
+Giao dịch: <I> + tx_id (utf-8), <I> + JSON compact của transaction
+"""
+import json
+import math
+import re
+import struct
+import sys
+from array import array
+
+from block import Block
+# _MISSING: field không có trong tx (khác None), dùng chung với Transaction
+from transaction import Transaction, _FIELDS, _MISSING
+
+CONTENT_TYPE = "application/x-chain-wire"
+
+_BLOCK = struct.Struct("<BBQdQ32s32sI")
+_BLOCKS = struct.Struct("<III")
+_LEN = struct.Struct("<I")
+
+_COUNT = struct.Struct("<I")
+
+# flags: timestamp là int (giữ đúng kiểu để hash v1 không đổi)
+_FLAG_INT_TIMESTAMP = 1
+
+# kind của tx trong block
+_TX_FROM = 1     # có from (index trong bảng string)
+_TX_TO = 2       # có to
+_TX_INT = 4      # amount int64
+_TX_FLOAT = 8    # amount float64
+_TX_EXTRA = 16   # có field lạ, nằm trong list JSON cuối block
+_TX_RAW = 32     # không đóng gói được (address không phải str, amount lạ...) -> cả tx trong list JSON
+_NO_STRING = 0xFFFFFFFF
+_INT64 = (-2 ** 63, 2 ** 63)
+_HEX = re.compile(r"(?:[0-9a-f]{2})+")
+_SWAP = sys.byteorder != "little"
+
+
+def _dump(obj):
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _pack_bytes(data):
+    return _LEN.pack(len(data)) + data
+
+
+def _unpack_bytes(data, offset):
+    (size,) = _LEN.unpack_from(data, offset)
+    offset += _LEN.size
+    end = offset + size
+    if end > len(data):
+        raise ValueError("Dữ liệu wire bị cắt cụt")
+    return data[offset:end], end
+
+
+def _column(typecode, values):
+    column = array(typecode, values)
+    if _SWAP:
+        column.byteswap()
+    return column.tobytes()
+
+
+def _read_column(typecode, data, offset, count):
+    column = array(typecode)
+    end = offset + count * column.itemsize
+    if end > len(data):
+        raise ValueError("Dữ liệu wire bị cắt cụt")
+    column.frombytes(data[offset:end])
+    if _SWAP:
+        column.byteswap()
+    return column, end
+
+
+# ---------- TRANSACTIONS ----------
+def _packable_amount(amount):
+    if type(amount) is int:
+        return _INT64[0] <= amount < _INT64[1]
+    return amount is _MISSING or type(amount) is float
+
+
+def _encode_txs(transactions):
+    strings = {}
+    kinds = bytearray()
+    senders, recipients = [], []
+    ints, floats = [], []
+    extras = []
+
+    for tx in transactions:
+        sender, recipient, amount = tx.sender, tx.recipient, tx.amount
+        if (not (sender is _MISSING or type(sender) is str)
+                or not (recipient is _MISSING or type(recipient) is str)
+                or not _packable_amount(amount)):
+            kinds.append(_TX_RAW)
+            extras.append(tx.to_dict())
+            continue
+
+        kind = 0
+        if sender is not _MISSING:
+            kind |= _TX_FROM
+            senders.append(strings.setdefault(sender, len(strings)))
+        if recipient is not _MISSING:
+            kind |= _TX_TO
+            recipients.append(strings.setdefault(recipient, len(strings)))
+        if type(amount) is int:
+            kind |= _TX_INT
+            ints.append(amount)
+        elif amount is not _MISSING:
+            kind |= _TX_FLOAT
+            floats.append(amount)
+        if tx.extra is not None:
+            kind |= _TX_EXTRA
+            extras.append(tx.extra)
+        kinds.append(kind)
+
+    hex_flags = bytearray()
+    blobs = []
+    for string in strings:
+        if _HEX.fullmatch(string):
+            hex_flags.append(1)
+            blobs.append(bytes.fromhex(string))
+        else:
+            hex_flags.append(0)
+            blobs.append(string.encode("utf-8"))
+
+    return b"".join((
+        _COUNT.pack(len(strings)),
+        bytes(hex_flags),
+        _column("I", [len(blob) for blob in blobs]),
+        *blobs,
+        bytes(kinds),
+        _column("I", senders),
+        _column("I", recipients),
+        _column("q", ints),
+        _column("d", floats),
+        _pack_bytes(_dump(extras) if extras else b""),
+    ))
+
+
+def _read_txs(data, offset, tx_count):
+    (string_count,) = _COUNT.unpack_from(data, offset)
+    offset += _COUNT.size
+    hex_flags = data[offset:offset + string_count]
+    offset += string_count
+    sizes, offset = _read_column("I", data, offset, string_count)
+    strings = []
+    for is_hex, size in zip(hex_flags, sizes):
+        blob = data[offset:offset + size]
+        offset += size
+        strings.append(blob.hex() if is_hex else blob.decode("utf-8"))
+    if offset > len(data):
+        raise ValueError("Dữ liệu wire bị cắt cụt")
+
+    kinds = data[offset:offset + tx_count]
+    offset += tx_count
+    if len(kinds) != tx_count:
+        raise ValueError("Dữ liệu wire bị cắt cụt")
+    count = lambda flag: sum(1 for kind in kinds if kind & flag)
+    senders, offset = _read_column("I", data, offset, count(_TX_FROM))
+    recipients, offset = _read_column("I", data, offset, count(_TX_TO))
+    ints, offset = _read_column("q", data, offset, count(_TX_INT))
+    floats, offset = _read_column("d", data, offset, count(_TX_FLOAT))
+    raw, offset = _unpack_bytes(data, offset)
+    extras = json.loads(raw) if raw else []
+    if len(extras) != count(_TX_EXTRA | _TX_RAW):
+        raise ValueError("Số field lạ trong block wire không khớp")
+
+    senders, recipients, ints, floats, extras = map(iter, (senders, recipients, ints, floats, extras))
+    transactions = []
+    try:
+        for kind in kinds:
+            if kind & _TX_RAW:
+                transactions.append(Transaction.from_dict(next(extras)))
+                continue
+            extra = next(extras) if kind & _TX_EXTRA else None
+            # extra chứa from/to/amount thì to_dict() (hash, JSON) và tx.get() (balance) sẽ lệch nhau
+            if extra is not None and (not isinstance(extra, dict) or not _FIELDS.isdisjoint(extra)):
+                raise ValueError("Field lạ của tx trong block wire không hợp lệ")
+            transactions.append(Transaction(
+                strings[next(senders)] if kind & _TX_FROM else _MISSING,
+                strings[next(recipients)] if kind & _TX_TO else _MISSING,
+                next(ints) if kind & _TX_INT else next(floats) if kind & _TX_FLOAT else _MISSING,
+                extra,
+            ))
+    except IndexError:
+        raise ValueError("Index string trong block wire không hợp lệ")
+    return transactions, offset
+
+
+# ---------- BLOCK ----------
+def encode_block(block):
+    flags = _FLAG_INT_TIMESTAMP if isinstance(block.timestamp, int) else 0
+    parts = [_BLOCK.pack(
+        block.version,
+        flags,
+        block.index,
+        block.timestamp,
+        block.nonce,
+        bytes.fromhex(block.previous_hash),
+        bytes.fromhex(block.hash),
+        len(block.transactions),
+    ), _encode_txs(block.transactions)]
+    return b"".join(parts)
+
+
+def _read_block(data, offset):
+    version, flags, index, timestamp, nonce, previous_hash, block_hash, tx_count = \
+        _BLOCK.unpack_from(data, offset)
+    offset += _BLOCK.size
+    transactions, offset = _read_txs(data, offset, tx_count)
+
+    if flags & _FLAG_INT_TIMESTAMP and math.isfinite(timestamp):
+        timestamp = int(timestamp)
+    header = {
+        "version": version,
+        "index": index,
+        "timestamp": timestamp,
+        "nonce": nonce,
+        "previous_hash": previous_hash.hex(),
+        "hash": block_hash.hex(),
+        "transactions": transactions,
+    }
+    # cùng điều kiện với Block.from_dict, block nhận qua wire phải gửi lại được dạng JSON
+    Block._check_fields(header)
+    block = Block(
+        index=index,
+        timestamp=header["timestamp"],
+        transactions=transactions,
+        previous_hash=header["previous_hash"],
+        nonce=nonce,
+        block_hash=header["hash"],
+        version=version,
+    )
+    return block, offset
+
+
+def decode_block(data):
+    try:
+        block, offset = _read_block(data, 0)
+    except struct.error as e:
+        raise ValueError(f"Block wire không hợp lệ: {e}")
+    if offset != len(data):
+        raise ValueError("Block wire thừa dữ liệu ở cuối")
+    return block
+
+
+# ---------- DANH SÁCH BLOCK (/chain, /blocks/range) ----------
+def blocks_header(length, start, count):
+    return _BLOCKS.pack(length, start, count)
+
+
+def encode_blocks(blocks, length, start=0):
+    return blocks_header(length, start, len(blocks)) + b"".join(encode_block(b) for b in blocks)
+
+
+def stream_blocks(encoded, length=None, start=0):
+    """Sinh danh sách block từ các block đã encode sẵn (vd ChainJsonCache), theo từng chunk."""
+    yield blocks_header(len(encoded) if length is None else length, start, len(encoded))
+    yield from encoded
+
+
+def decode_blocks(data):
+    """Trả về (length, start, list[Block])."""
+    try:
+        length, start, count = _BLOCKS.unpack_from(data, 0)
+        offset = _BLOCKS.size
+        blocks = []
+        for _ in range(count):
+            block, offset = _read_block(data, offset)
+            blocks.append(block)
+    except struct.error as e:
+        raise ValueError(f"Danh sách block wire không hợp lệ: {e}")
+    if offset != len(data):
+        raise ValueError("Danh sách block wire thừa dữ liệu ở cuối")
+    return length, start, blocks
+
+
+# ---------- GIAO DỊCH ----------
+def encode_tx(tx_id, transaction):
+    return _pack_bytes(str(tx_id).encode("utf-8")) + _pack_bytes(_dump(transaction))
+
+
+def decode_tx(data):
+    """Trả về (tx_id, transaction)."""
+    try:
+        tx_id, offset = _unpack_bytes(data, 0)
+        transaction, offset = _unpack_bytes(data, offset)
+    except struct.error as e:
+        raise ValueError(f"Giao dịch wire không hợp lệ: {e}")
+    if offset != len(data):
+        raise ValueError("Giao dịch wire thừa dữ liệu ở cuối")
+    return tx_id.decode("utf-8"), json.loads(transaction)